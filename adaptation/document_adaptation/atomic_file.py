@@ -0,0 +1,46 @@
+"""
+    atomic_file.py: writing of cache files through a temporary file renamed over the destination,
+        so that readers never see a partial file
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import os
+import tempfile
+
+
+def atomic_write(path, write):
+    """
+    Write a file atomically: concurrent readers and a restart after a crash see either the old file or the new one.
+    The temporary file is created in the directory of path (created if needed) and removed if write fails.
+    @param path: destination file
+    @param write: function tmp_path -> None writing the content to the temporary file
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_write_bytes(path, data):
+    """
+    Write bytes atomically (see atomic_write)
+    @param path: destination file
+    @param data: bytes
+    """
+    def write(tmp_path):
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+    atomic_write(path, write)
@@ -0,0 +1,136 @@
+"""
+    document_cache.py: on-disk cache of the user independent analysis of a document
+        (normalized text, salient sentences, sentence embeddings and readability)
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import os
+import pickle
+import hashlib
+import threading
+import time
+from .atomic_file import atomic_write_bytes
+
+
+class DocumentCache():
+    """
+    Content-hash keyed cache of DocumentModel analyses, stored as one pickle file per document.
+    When the total size of the cache exceeds max_bytes the least recently used entries are evicted.
+    """
+    extension = '.pkl'
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024):
+        """
+        @param path: directory where the entries are stored
+        @param max_bytes: upper bound of the size of the cache on disk
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = {}  # key -> [size, last access]
+        self.total_bytes = 0
+        os.makedirs(self.path, exist_ok=True)
+        for filename in os.listdir(self.path):
+            if filename.endswith('.tmp'):
+                # left by a write interrupted by a crash
+                try:
+                    os.remove(os.path.join(self.path, filename))
+                except OSError:
+                    pass
+                continue
+            if not filename.endswith(self.extension):
+                continue
+            stat = os.stat(os.path.join(self.path, filename))
+            self.entries[filename[:-len(self.extension)]] = [stat.st_size, stat.st_mtime]
+            self.total_bytes += stat.st_size
+
+    @staticmethod
+    def key(text, language, version=''):
+        """
+        Key of a document: hash of its content and of everything the analysis depends on
+        @param text: plain text of the document
+        @param language: language of the embedder used for the sentences
+        @param version: any other parameter of the analysis (e.g. TextRank ratio)
+
+        @return hex digest
+        """
+        digest = hashlib.sha1()
+        digest.update('{}|{}|'.format(language, version).encode('utf-8'))
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key + self.extension)
+
+    def get(self, key):
+        """
+        @param key: key returned by DocumentCache.key
+
+        @return the cached analysis or None
+        """
+        with self.lock:
+            if key not in self.entries:
+                return None
+            now = time.time()
+            self.entries[key][1] = now
+        try:
+            with open(self.entry_path(key), 'rb') as f:
+                analysis = pickle.load(f)
+            os.utime(self.entry_path(key), (now, now))
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.discard(key)
+            return None
+        return analysis
+
+    def put(self, key, analysis):
+        """
+        Store an analysis, evicting the least recently used entries if needed.
+        Errors are only logged: the cache is an optimization and must not fail the request.
+        @param key: key returned by DocumentCache.key
+        @param analysis: picklable object
+        """
+        try:
+            data = pickle.dumps(analysis, protocol=pickle.HIGHEST_PROTOCOL)
+            if len(data) > self.max_bytes:
+                return
+            atomic_write_bytes(self.entry_path(key), data)
+        except (OSError, pickle.PicklingError) as e:
+            print("Could not cache document {}: {}".format(key, e))
+            return
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries[key][0]
+            self.entries[key] = [len(data), time.time()]
+            self.total_bytes += len(data)
+            self.evict()
+
+    def discard(self, key):
+        with self.lock:
+            self.remove(key)
+
+    def remove(self, key):
+        """ Remove an entry, the caller must hold the lock """
+        size, _ = self.entries.pop(key, (0, 0))
+        self.total_bytes -= size
+        try:
+            os.remove(self.entry_path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        """ Drop least recently used entries until the cache fits max_bytes, the caller must hold the lock """
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key in sorted(self.entries, key=lambda k: self.entries[k][1]):
+            self.remove(key)
+            if self.total_bytes <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self.lock:
+            for key in list(self.entries):
+                self.remove(key)
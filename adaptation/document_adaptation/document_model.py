@@ -19,6 +19,12 @@ from rake_nltk import Rake
 from gensim.summarization.summarizer import summarize
 import html
 
+PRE_RE = re.compile('<pre>.*?</pre>', flags=re.DOTALL)
+CODE_RE = re.compile('<code>.*?</code>', flags=re.DOTALL)
+COPYRIGHT_RE = re.compile('<[^>]+>©', flags=re.DOTALL)
+# a space is added after every '.' and ',', then removed where a digit follows (e.g. 3.14, 1,000)
+NUMBER_SPACE_RE = re.compile('([.,]) (?=[0-9])')
+CITATION_RE = re.compile(r'\[.*?\]', flags=re.DOTALL)
 
 class DocumentModel():
     """
@@ -29,9 +35,12 @@ class DocumentModel():
         * sections = sections dict of documents, equal to json [{title:'', content:''},...]
         * user = User object of the request [document_adaption.user]
         * plain_text = plain_text without markup tags or noisy simbols
-        * normalized_text = plain text after normalization step
+        * normalized_text = plain text after normalization step (computed on first access)
         * stop_words = the stop words for the text
+        * reading_ease = Flesch-Kincaid reading ease of plain_text (computed on first access)
         * readability_score = value for the readability of such text
+        * summarized_sentences = salient sentences extracted from normalized_text
+        * sentence_embeddings = float32 matrix with the embeddings of summarized_sentences
         * nlp = spacy dictionary for readability evaluation 
         * score = the score given by SDAIS module to the document
     """
@@ -42,9 +51,12 @@ class DocumentModel():
         self.sections = []
         self.user = user
         self.plain_text = ''
-        self.normalized_text = ''
+        self._normalized_text = None
         self.stop_words = stop_words
+        self.reading_ease = None
         self.readability_score = 0
+        self.summarized_sentences = []
+        self.sentence_embeddings = None
         self.affinity_score = 0
         self.nlp = nlp
         self.score = 0
@@ -58,7 +70,26 @@ class DocumentModel():
             if 'score' in result:
                 self.score = result['score']
             self.plain_text = self.get_plain_text(result)
-            self.normalized_text = self.normalize(self.plain_text)
+
+    @property
+    def normalized_text(self):
+        if self._normalized_text is None:
+            self._normalized_text = self.normalize(self.plain_text)
+        return self._normalized_text
+
+    @normalized_text.setter
+    def normalized_text(self, text):
+        self._normalized_text = text
+
+    def load_analysis(self, analysis):
+        """
+        Restore the user independent analysis of the document (see DocumentsAdaptation.analyse_document)
+        @param analysis: dictionary with normalized_text, sentences, embeddings and flesch_kincaid
+        """
+        self.normalized_text = analysis['normalized_text']
+        self.summarized_sentences = analysis['sentences']
+        self.sentence_embeddings = analysis['embeddings']
+        self.reading_ease = analysis['flesch_kincaid']
 
     def get_plain_text(self, result):
         """ 
@@ -67,24 +98,37 @@ class DocumentModel():
         
         @return plain text containing title, section's title, sections'content, \n separated
         """
-        plain_text = result['title'] + '.\n'
-        if len(result['sections']):
-            for section in result['sections']:
-                plain_text += section[
-                    'title'] + '.\n' if 'title' in section else ''
-                plain_text += section['content'] if 'content' in section else ''
-        return plain_text
+        parts = [result['title'], '.\n']
+        for section in result['sections']:
+            if 'title' in section:
+                parts += [section['title'], '.\n']
+            if 'content' in section:
+                parts.append(section['content'])
+        return ''.join(parts)
 
     def normalize(self, text):
         """Function of cleaning text from JS and HTML tags"""
-        text = re.sub('<pre>.*?</pre>', '', text, flags=re.DOTALL)
-        text = re.sub('<code>.*?</code>', '', text, flags=re.DOTALL)
-        text = re.sub('<[^>]+>©', '', text, flags=re.DOTALL)
-        text = re.sub('(?<=[.,])(?![0-9])', ' ', text, flags=re.DOTALL)
-        text = re.sub('\[.*?\]', '', text, flags=re.DOTALL)
-        text = re.sub('\[.*?\]', '-', text, flags=re.DOTALL)
-        text = ' '.join(text.splitlines())
-        return text
+        if '<pre>' in text:
+            text = PRE_RE.sub('', text)
+        if '<code>' in text:
+            text = CODE_RE.sub('', text)
+        if '©' in text:
+            text = COPYRIGHT_RE.sub('', text)
+        text = NUMBER_SPACE_RE.sub(r'\1', text.replace('.', '. ').replace(',', ', '))
+        # citations like [1]
+        if '[' in text:
+            text = CITATION_RE.sub('', text)
+        return ' '.join(text.splitlines())
+
+    def flesch_kincaid(self):
+        """
+        Flesch-Kincaid reading ease of the plain text, computed with the spacy pipeline only once
+        @return float, the higher the easier
+        """
+        if self.reading_ease is None:
+            doc = self.nlp(self.plain_text)
+            self.reading_ease = doc._.flesch_kincaid_reading_ease
+        return self.reading_ease
 
     def user_readability_score(self):
         """ 
@@ -93,9 +137,7 @@ class DocumentModel():
         Returns:
             Float value between 0 (easy to read) and 1 (difficult to read). 
         """
-        doc = self.nlp(self.plain_text)
-
-        docscore = doc._.flesch_kincaid_reading_ease
+        docscore = self.flesch_kincaid()
         docscore = docscore / 100
         if docscore > 1 or docscore < 0:
             return 0
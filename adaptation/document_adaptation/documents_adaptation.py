@@ -10,20 +10,54 @@
 # SDAIS = Smart Deep AI for Search
 # Commentiamo tutte le funzioni e classi seguendo formato Doxygen
 from concurrent.futures import ThreadPoolExecutor as PoolExecutor
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 from .document_model import DocumentModel
 from .semantic_search import Semantic_Search, BERT_distance, BPEmb_Embedding_distance
-from .salient_sentences import from_document_to_salient, SisterEmbedder
+from .salient_sentences import SalientScores, split_sentences, extract_salient_sentences, embed_salient_sentences, SisterEmbedder
+from . import readability
+from . import near_duplicates
+from .document_cache import DocumentCache
+from .embedding_cache import EmbeddingCache
 from .policy import Policy
+from .visualizer import Visualizer
 from .summarization import ModelSummarizer
 from .transitions import transitions_handler
+from .language_registry import LanguageRegistry, LanguageModels, PipelineRegistry
+from .keyword_expansion import KeywordExpander
+from .taste_embeddings import TasteEmbeddings
+from .user import User
+import threading
 import spacy
 import numpy as np
 from bpemb import BPEmb
-from spacy_readability import Readability
 import time
+import os
+import atexit
+
+# bump when the user independent analysis of documents changes, invalidates DocumentCache
+ANALYSIS_VERSION = 2
+
+# Inherited by the forked workers of the process pool: the DocumentsAdaptation and the
+# (spacy pipeline, embedder) of each language loaded at fork time. Workers never use the
+# registries, whose locks may have been held by another thread of the parent when it forked.
+# Languages loaded after the fork are analysed in threads (see analyse_documents).
+_worker_adaptation = None
+_worker_models = {}
+_worker_start = None
+
+def _start_worker():
+    # keeps the worker busy until all of them are forked (see create_process_pool)
+    _worker_start.wait(60)
+
+def _analyse_in_worker(plain_text, language):
+    nlp, embedder = _worker_models[language]
+    return _worker_adaptation.analyse_text(plain_text, language, nlp=nlp, embedder=embedder)
 
 class DocumentsAdaptation():
-    def __init__(self, config, max_workers=None, verbose=False):
+    def __init__(self, config, max_workers=None, verbose=False, autosave=True):
         self.config = config
         self.available_languages = {
             'en': 'en_core_web_md',
@@ -35,7 +69,6 @@ class DocumentsAdaptation():
         }
         # we can use also BERT distance, but it's slower and does not support multi language
         # self.distance = BERT_distance()
-        print("Preloading Word Embeddings for selected languages...")
         # list of the language we want to suppport
         dim = 200
         vs = 200000
@@ -49,25 +82,117 @@ class DocumentsAdaptation():
 
         self.verbose = verbose
         self.max_workers = max_workers
-        self.transition = transitions_handler(self.config.transition_data_path)
-            
-        self.model_summarizer = {
-            l: ModelSummarizer(config, lang=l, verbose=self.verbose)
-            for l in self.languages
-        }
-        self.embedder = {
-            l: SisterEmbedder(lang=l)
-            for l in self.languages
-        }
-        self.nlp = {
-            l: spacy.load(self.available_languages[l])
-            for l in self.languages
-        }
-        # Add Readability to nlp pipe
-        for lang in self.nlp:
-            read = Readability()
-            nlp = self.get_nlp(lang)
-            nlp.add_pipe(read, last=True)
+        self.transition = transitions_handler(self.config.transition_data_path,
+                                              reload_interval=self.config.transitions_reload_interval)
+        self.document_cache = None
+        if config.document_cache_path:
+            self.document_cache = DocumentCache(config.document_cache_path, config.document_cache_max_bytes)
+
+        # SimHash of the pages already seen, by content hash
+        self.document_fingerprints = near_duplicates.FingerprintCache(config.near_duplicate_cache_size)
+
+        # Transformer embeddings of the sentences, shared by the summarizers of all languages
+        self.embedding_cache = EmbeddingCache(config.summarizer_cache_max_bytes, config.summarizer_cache_path)
+        atexit.register(self.embedding_cache.save)
+
+        # Models of each language are loaded on first use
+        self.pipelines = PipelineRegistry(self.available_languages, fallback='multi', verbose=self.verbose)
+        self.process_pool = None
+        self.pool_languages = set()
+        self.expander_lock = threading.Lock()
+        # embeddings of the tastes, shared by all the users
+        self.taste_embeddings = TasteEmbeddings(config.taste_cache_max_entries)
+        self.registry = LanguageRegistry(self.load_language,
+                                         max_loaded=config.max_loaded_languages,
+                                         on_change=self.on_languages_change,
+                                         verbose=self.verbose)
+        print("Preloading models for {}...".format(config.preload_languages))
+        self.registry.preload(config.preload_languages)
+        if config.salient_executor == 'process':
+            # forked once, before serving: forking from a request thread could deadlock the workers
+            self.create_process_pool()
+        # started after the fork, the workers never inherit its locks;
+        # callers forking later (grid_search) disable it, the cache is still saved at exit
+        if autosave:
+            self.embedding_cache.start_autosave(config.summarizer_cache_save_interval)
+
+    def load_language(self, lang):
+        """
+        Load summarization model, word embeddings and spacy pipeline of a language
+        @param lang: language abbreviation (e.g. "en")
+
+        @return LanguageModels
+        """
+        embedder = SisterEmbedder(lang=lang, vectors_path=self.get_vectors_path(lang))
+        self.taste_embeddings.precompute(lang, self.config.known_tastes, embedder)
+        return LanguageModels(
+            summarizer=ModelSummarizer(self.config, lang=lang, verbose=self.verbose,
+                                       embedding_cache=self.embedding_cache),
+            embedder=embedder,
+            nlp=self.pipelines.get(lang))
+
+    def on_languages_change(self, loaded, evicted):
+        """
+        Release the spacy pipelines of evicted languages.
+        The process pool is not forked again: the languages loaded later are analysed in threads.
+        """
+        if evicted:
+            self.pipelines.discard(evicted, keep=self.registry.loaded())
+
+    def create_process_pool(self):
+        # Workers are forked only once the models are loaded, so they share their memory copy-on-write.
+        # Only these languages go to the pool: loading another one in each worker would copy its models.
+        global _worker_adaptation, _worker_models, _worker_start
+        context = multiprocessing.get_context('fork')
+        _worker_adaptation = self
+        _worker_models = {lang: (models.nlp, models.embedder) for lang, models in self.registry.items()}
+        _worker_start = context.Event()
+        process_pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        # fork all the workers now, not lazily on the first request: each no-op blocks its worker,
+        # so every submit forks a new one
+        workers = self.max_workers or os.cpu_count() or 1
+        started = [process_pool.submit(_start_worker) for _ in range(workers)]
+        _worker_start.set()
+        for future in started:
+            future.result()
+        self.pool_languages = set(_worker_models)
+        self.process_pool = process_pool
+
+    def get_summarizer(self, lang):
+        return self.registry.get(lang).summarizer
+
+    def get_embedder(self, lang):
+        return self.registry.get(lang).embedder
+
+    def get_expander(self, lang):
+        """
+        @return KeywordExpander of the language, its index is built on first use
+        """
+        models = self.registry.get(lang)
+        if models.expander is None:
+            with self.expander_lock:
+                if models.expander is None:
+                    models.expander = KeywordExpander(
+                        models.embedder,
+                        stopwords=self.get_language_stopwords(User({'language': lang})),
+                        max_words=self.config.keyword_expansion_max_words,
+                        min_count=self.config.keyword_expansion_min_count,
+                        k=self.config.keyword_expansion_k,
+                        min_similarity=self.config.keyword_expansion_min_similarity,
+                        verbose=self.verbose)
+        return models.expander
+
+    def get_vectors_path(self, lang):
+        """
+        @return the memory-mapped word vectors store of the language or None to load the fastText model
+        """
+        if not self.config.mmap_vectors_dir:
+            return None
+        path = os.path.join(self.config.mmap_vectors_dir, lang)
+        if not os.path.exists(os.path.join(path, 'index.json')):
+            print("No word vectors store in {}, loading fastText model".format(path))
+            return None
+        return path
 
     def update_config(self, config):
         self.config = config
@@ -77,10 +202,24 @@ class DocumentsAdaptation():
             raise Exception("Sorry, '{}' not yet supported".format(lang))
 
     def get_nlp(self, lang):
-        if lang in self.nlp:
-            return self.nlp[lang]
-        else:
-            return spacy.load(self.available_languages['multi'])
+        """
+        @return spacy pipeline with Readability of the language, the multi-language one if not supported
+        """
+        if lang in self.languages:
+            # keeps the language resident, its pipeline is already loaded
+            self.registry.get(lang)
+        return self.pipelines.get(lang)
+
+    def stats(self):
+        """
+        @return loaded languages, usage of the spacy pipelines, records of the visualizer and cached tastes
+        """
+        return {
+            'languages': self.registry.loaded(),
+            'spacy': self.pipelines.stats(),
+            'visualizer': Visualizer.stats(),
+            'taste_embeddings': self.taste_embeddings.stats()
+        }
 
     def get_language_stopwords(self, user):
         """
@@ -110,39 +249,161 @@ class DocumentsAdaptation():
             d.score = norm_scores[index]
         return documents
 
-    def get_keywords(self, tastes):
+    def analyse_text(self, plain_text, language, reading_ease=None, nlp=None, embedder=None):
         """
-        Function for keyword expansion
-        OBS: at the moment no keyword expansion in performed
+        User independent analysis of a document: normalization, salient sentences, their embeddings
+        and Flesch-Kincaid reading ease.
+        It only returns plain python objects and float32 arrays, so it is cheap to send back from a worker process.
+        @param plain_text: plain text of the document
+        @param language: language of the request
+        @param reading_ease: Flesch-Kincaid reading ease if already computed (see readability.spacy_reading_ease)
+        @param nlp, embedder: models of the language, taken from the registries if None
+
+        @return dictionary with normalized_text, sentences, embeddings and flesch_kincaid
+        """
+        if nlp is None:
+            nlp = self.get_nlp(language)
+        if embedder is None:
+            embedder = self.get_embedder(language)
+        document = DocumentModel(None, None, nlp)
+        document.plain_text = plain_text
+        units = split_sentences(document.normalized_text)
+        sentences = extract_salient_sentences(document.normalized_text, units=units)
+        if self.config.near_duplicate_sentence_distance is not None:
+            sentences = [sentences[i] for i in near_duplicates.unique(
+                sentences, self.config.near_duplicate_sentence_distance,
+                shingle_size=near_duplicates.SENTENCE_SHINGLE_SIZE, confirm=near_duplicates.same_facts)]
+        if reading_ease is not None:
+            document.reading_ease = reading_ease
+        elif self.config.readability_backend == 'fast':
+            # same sentences of TextRank, no spacy parsing
+            document.reading_ease = readability.reading_ease([u.text for u in units])
+        else:
+            # in the worker (or thread) of the document, only the components needed by readability
+            document.reading_ease = readability.spacy_reading_ease(nlp, [plain_text])[0]
+        return {
+            'normalized_text': document.normalized_text,
+            'sentences': sentences,
+            'embeddings': embed_salient_sentences(sentences, embedder),
+            'flesch_kincaid': document.flesch_kincaid()
+        }
+
+    def analyse_documents(self, documents, language):
+        """
+        Load the analysis of each document, taking it from the document cache or computing it
+        in the thread pool or in the process pool (see config.salient_executor)
+        @param documents: list of DocumentModel
+        @param language: language of the request
+
+        @return list of dictionaries (see analyse_text)
+        """
+        version = '{}-{}-{}'.format(ANALYSIS_VERSION, self.config.readability_backend,
+                                    self.config.near_duplicate_sentence_distance)
+        keys = [DocumentCache.key(d.plain_text, language, version) for d in documents]
+        analyses = [self.document_cache.get(k) if self.document_cache else None for k in keys]
+        missing = [i for i, a in enumerate(analyses) if a is None]
+
+        if missing:
+            texts = [documents[i].plain_text for i in missing]
+            # keeps the language resident while its documents are analysed
+            self.registry.get(language)
+            # readability is computed with the rest of the analysis, in parallel across documents
+            computed = None
+            process_pool = self.process_pool
+            if process_pool and language in self.pool_languages:
+                try:
+                    computed = list(process_pool.map(_analyse_in_worker, texts, [language] * len(texts),
+                                                     timeout=self.config.process_pool_timeout))
+                except (FutureTimeoutError, BrokenProcessPool) as e:
+                    # analysed in this process instead
+                    print("Process pool failed ({}), analysing {} documents in threads".format(
+                        type(e).__name__, len(texts)))
+                    if isinstance(e, BrokenProcessPool) and self.process_pool is process_pool:
+                        self.process_pool = None
+            if computed is None:
+                with PoolExecutor(max_workers=self.max_workers) as executor:
+                    computed = list(executor.map(lambda t: self.analyse_text(t, language), texts))
+            for i, analysis in zip(missing, computed):
+                analyses[i] = analysis
+                if self.document_cache:
+                    self.document_cache.put(keys[i], analysis)
+
+        for document, analysis in zip(documents, analyses):
+            document.load_analysis(analysis)
+        return analyses
+
+    def remove_near_duplicate_documents(self, documents):
+        """
+        Drop the documents that are near duplicates (e.g. mirror pages) of one with a higher IR score
+        @param documents: list of DocumentModel
+
+        @return list of DocumentModel, in the original order
+        """
+        distance = self.config.near_duplicate_distance
+        if distance is None:
+            return documents
+        order = sorted(range(len(documents)), key=lambda i: documents[i].score, reverse=True)
+        keep = near_duplicates.unique([documents[i].plain_text for i in order], distance,
+                                      fingerprints=self.document_fingerprints)
+        keep = sorted(order[i] for i in keep)
+        if self.verbose and len(keep) < len(documents):
+            print("Near duplicate documents removed: {}".format(len(documents) - len(keep)))
+        return [documents[i] for i in keep]
+
+    def remove_near_duplicate_sentences(self, documents):
+        """
+        Drop from the analysed documents the salient sentences that are near duplicates of a sentence
+        of a document with a higher IR score, before scoring and summarization
+        @param documents: list of analysed DocumentModel
+        """
+        distance = self.config.near_duplicate_sentence_distance
+        if distance is None:
+            return
+        index = near_duplicates.NearDuplicateIndex(distance)
+        removed = 0
+        for document in sorted(documents, key=lambda d: d.score, reverse=True):
+            keep = near_duplicates.unique(document.summarized_sentences, distance, index=index,
+                                          shingle_size=near_duplicates.SENTENCE_SHINGLE_SIZE,
+                                          confirm=near_duplicates.same_facts)
+            if len(keep) < len(document.summarized_sentences):
+                removed += len(document.summarized_sentences) - len(keep)
+                document.summarized_sentences = [document.summarized_sentences[i] for i in keep]
+                document.sentence_embeddings = document.sentence_embeddings[keep]
+        if self.verbose and removed:
+            print("Near duplicate sentences removed: {}".format(removed))
+
+    def get_keywords(self, tastes, language='en'):
+        """
+        Function for keyword expansion: each taste with its nearest words in the fastText vocabulary
         @param tastes: the user's tastes
+        @param language: language of the user
 
         @return dictionary of list of expanded keywords
         """
+        self.language_assertion(language)
+        expander = self.get_expander(language)
         res = {}
         for taste in tastes:
-            res[taste] = [taste]
+            res[taste] = expander.expand(taste)
         if self.verbose:
             print("Expanded keywords: ", res)
         return res
 
-    def get_tailored_text(self, results, user, use_transitions=True):
+    def get_salient_scores(self, results, user):
         """
-        This function takes some text and returns the tailored text according to the user's characteristics (e.g. tastes, expLevel, ...)
+        Weight independent part of the adaptation: analysis of the documents, salient sentences,
+        their embeddings, readability and affinity to the keywords
         @param results: list of text documents
         @param user: class representing the user
-        @param use_transitions: boolean flag for indicating if manually written transitions between paragraphs should be used
 
-        @return final tailored document
+        @return SalientScores, weighed with the weights in self.config, None if no document has content
         """
         if self.verbose:
             time_start = time.clock()
 
-        if len(results) <= 0:
-            return "Content not found"
-
         # Loading correct language for BPE embeddings
-        embedder = self.embedder[user.language]
-        user.embed_tastes(embedder)
+        embedder = self.get_embedder(user.language)
+        user.embed_tastes(embedder, cache=self.taste_embeddings)
         stop_words = self.get_language_stopwords(user)
         # Load spacy dictionary for readibility evaluation
         nlp = self.get_nlp(user.language)
@@ -154,59 +415,90 @@ class DocumentsAdaptation():
         # Remove document without content
         documents = list(filter(lambda x: bool(x.plain_text), documents))
         documents = self.normalize_IR_score(documents)
+        documents = self.remove_near_duplicate_documents(documents)
 
         # sort on the IR value
         #sorted(documents, key=lambda x: x.score, reverse=True)
 
         if len(documents) <= 0:
-            return "Content not found"
+            return None
 
         if self.verbose:
             print("Total chars in documents: {}".format(
                 sum([len(doc.plain_text) for doc in documents])))
             print("Init request time: {}".format(time.clock() - time_start))
+            time_start = time.clock()
 
-        # Parallel function for evaluate the document's affinity
-        def create_list_salient_sentences(document):
+        self.analyse_documents(documents, user.language)
+        self.remove_near_duplicate_sentences(documents)
+
+        # User dependent part of the evaluation of the document's affinity
+        for document in documents:
             document.user_readability_score()  # QUESTION?
-            salient_sentences = from_document_to_salient(
-                document, embedder, self.config, user.tastes)
-            return salient_sentences
+        scores = SalientScores(documents, embedder, user.tastes, self.config,
+                               keyword_embeddings=user.tastes_embedded)
 
         if self.verbose:
-            time_start = time.clock()
-            
-        with PoolExecutor(max_workers=self.max_workers) as executor:
-            futures = executor.map(create_list_salient_sentences, documents)
-        salient_sentences = list(futures)
-        salient_sentences = [x for s in salient_sentences for x in s]
+            print("Salient sentences extraction time: {}".format(time.clock() - time_start))
+        return scores
+
+    def select_sentences(self, scores, user):
+        """
+        Apply the policy to the salient sentences, with their current weighing (see SalientScores.weigh)
+        @param scores: SalientScores of the request
+        @param user: class representing the user
 
+        @return dictionary keyword -> list of SalientSentence
+        """
         if self.verbose:
-            print("Salient sentences extraction time: {}".format(time.clock() - time_start))
             time_start = time.clock()
-        
-        # policy on sentences
-        policy = Policy(salient_sentences, user, self.config.max_cluster_size)
-        policy.auto(debug=True)
+
+        policy = Policy(scores.salient_sentences(), user, self.config.max_cluster_size,
+                        algorithm=self.config.policy_algorithm)
+        # only a sample of the requests is exported to TensorBoard (config.visualizer_sample_rate)
+        policy.auto(debug=Visualizer.sampled())
 
         if self.verbose:
+            print("Policy filter: {}".format(policy.filter_counts))
             print("Policy time: {}".format(time.clock() - time_start))
+        return policy.results
+
+    def iter_summaries(self, selection, user):
+        """
+        Summarize the sentences selected for each keyword
+        @param selection: dictionary keyword -> list of SalientSentence (see select_sentences)
+        @param user: class representing the user
+
+        @return generator of (keyword, summary), each one as soon as it is ready
+        """
+        if self.verbose:
             time_start = time.clock()
 
         # create batch of sentences for summarization model
-        batch_sentences, num_sentences, keywords = self.model_summarizer[
-            user.language].to_batch(policy.results,
-                                    aggregate_from_same_doc=True)
-        summaries = self.model_summarizer[user.language].inference(
-            batch_sentences, num_sentences)
+        model_summarizer = self.get_summarizer(user.language)
+        batch_sentences, num_sentences, keywords = model_summarizer.to_batch(
+            selection, aggregate_from_same_doc=True)
+        summaries = model_summarizer.iter_inference(batch_sentences, num_sentences)
+        for keyword, summary in zip(keywords, summaries):
+            yield keyword, summary
 
         if self.verbose:
             print("Summarization time: {}".format(time.clock() - time_start))
-            print("####----- Tailored result -----####")
 
-        tailored_result = ''
-        for index, res in enumerate(zip(keywords, summaries)):
-            keyword, summary = res
+    def iter_paragraphs(self, selection, user, use_transitions=True):
+        """
+        Paragraphs of the tailored document: the summary of each keyword preceded by its transition
+        @param selection: dictionary keyword -> list of SalientSentence (see select_sentences)
+        @param user: class representing the user
+        @param use_transitions: boolean flag for indicating if manually written transitions between paragraphs should be used
+
+        @return generator of (keyword, paragraph), each one as soon as its summary is ready
+        """
+        # languages without a transitions file get paragraphs without transitions
+        use_transitions = use_transitions and user.language in self.transition.languages()
+        if self.verbose:
+            print("####----- Tailored result -----####")
+        for index, (keyword, summary) in enumerate(self.iter_summaries(selection, user)):
             paragraph = ''
 
             if (use_transitions and index > 0):
@@ -218,6 +510,43 @@ class DocumentsAdaptation():
                 print("[{}]".format(keyword.upper()))
                 print("{}".format(paragraph))
 
-            tailored_result += paragraph
+            yield keyword, paragraph
 
-        return tailored_result
+    def write_tailored_text(self, selection, user, use_transitions=True):
+        """
+        Summarize the sentences selected for each keyword and join the paragraphs
+        @param selection: dictionary keyword -> list of SalientSentence (see select_sentences)
+        @param user: class representing the user
+        @param use_transitions: boolean flag for indicating if manually written transitions between paragraphs should be used
+
+        @return final tailored document
+        """
+        return ''.join(paragraph for _, paragraph in self.iter_paragraphs(selection, user, use_transitions))
+
+    def iter_tailored_text(self, results, user, use_transitions=True):
+        """
+        Tailored text according to the user's characteristics, paragraph by paragraph
+        @param results: list of text documents
+        @param user: class representing the user
+        @param use_transitions: boolean flag for indicating if manually written transitions between paragraphs should be used
+
+        @return generator of (keyword, paragraph), a single (None, "Content not found") if nothing is relevant
+        """
+        scores = self.get_salient_scores(results, user) if len(results) > 0 else None
+        if scores is None:
+            yield None, "Content not found"
+            return
+
+        selection = self.select_sentences(scores, user)
+        yield from self.iter_paragraphs(selection, user, use_transitions)
+
+    def get_tailored_text(self, results, user, use_transitions=True):
+        """
+        This function takes some text and returns the tailored text according to the user's characteristics (e.g. tastes, expLevel, ...)
+        @param results: list of text documents
+        @param user: class representing the user
+        @param use_transitions: boolean flag for indicating if manually written transitions between paragraphs should be used
+
+        @return final tailored document
+        """
+        return ''.join(paragraph for _, paragraph in self.iter_tailored_text(results, user, use_transitions))
@@ -0,0 +1,135 @@
+"""
+    embedding_cache.py: in-memory LRU cache of the sentence embeddings computed by the
+        summarizer's encoder, with optional persistence on disk
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import os
+import pickle
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from .atomic_file import atomic_write_bytes
+
+
+class EmbeddingCache():
+    """
+    Sentence embeddings keyed by model name and sentence hash.
+    When the embeddings exceed max_bytes the least recently used ones are evicted.
+    """
+    def __init__(self, max_bytes=256 * 1024 * 1024, path=None):
+        """
+        @param max_bytes: memory budget of the stored embeddings
+        @param path: file where the cache is saved by save() and loaded from at creation, no persistence if None
+        """
+        self.max_bytes = max_bytes
+        self.path = path
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.autosave_thread = None
+        if path and os.path.exists(path):
+            self.load()
+
+    @staticmethod
+    def key(model_name, sentence):
+        return (model_name, hashlib.sha1(sentence.encode('utf-8')).digest())
+
+    def get_many(self, model_name, sentences):
+        """
+        @param model_name: name of the encoder (model and hidden layer)
+        @param sentences: list of strings
+
+        @return list with the embedding of each sentence, None for the missing ones
+        """
+        result = []
+        with self.lock:
+            for sentence in sentences:
+                key = self.key(model_name, sentence)
+                embedding = self.entries.get(key)
+                if embedding is None:
+                    self.misses += 1
+                else:
+                    self.hits += 1
+                    self.entries.move_to_end(key)
+                result.append(embedding)
+        return result
+
+    def put_many(self, model_name, sentences, embeddings):
+        """
+        @param model_name: name of the encoder (model and hidden layer)
+        @param sentences: list of strings
+        @param embeddings: one embedding (numpy array) for each sentence
+        """
+        with self.lock:
+            for sentence, embedding in zip(sentences, embeddings):
+                key = self.key(model_name, sentence)
+                if key in self.entries:
+                    self.total_bytes -= self.entries[key].nbytes
+                # copy, so that the rows do not keep alive the whole batch matrix
+                self.entries[key] = embedding.copy()
+                self.entries.move_to_end(key)
+                self.total_bytes += embedding.nbytes
+            while self.total_bytes > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted.nbytes
+            self.dirty = True
+
+    def save(self):
+        """
+        Write the cache to self.path if it changed since the last save
+        """
+        if not self.path:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            # the stored arrays are never modified, a shallow copy is enough to pickle outside the lock
+            entries = list(self.entries.items())
+            self.dirty = False
+        try:
+            atomic_write_bytes(self.path, pickle.dumps(entries, protocol=pickle.HIGHEST_PROTOCOL))
+        except OSError as e:
+            print("Could not save the sentence embeddings cache {}: {}".format(self.path, e))
+            with self.lock:
+                self.dirty = True
+
+    def start_autosave(self, interval):
+        """
+        Save the cache every interval seconds from a background thread, so that it survives
+        a kill without exit handlers
+        @param interval: seconds between saves, None or 0 to only save explicitly
+        """
+        if not self.path or not interval or self.autosave_thread is not None:
+            return
+
+        def autosave():
+            while True:
+                time.sleep(interval)
+                self.save()
+
+        self.autosave_thread = threading.Thread(target=autosave, name='embedding-cache-autosave', daemon=True)
+        self.autosave_thread.start()
+
+    def load(self):
+        try:
+            with open(self.path, 'rb') as f:
+                entries = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            print("Could not load the sentence embeddings cache {}".format(self.path))
+            return
+        with self.lock:
+            for key, embedding in entries:
+                self.entries[key] = embedding
+                self.total_bytes += embedding.nbytes
+            while self.total_bytes > self.max_bytes and self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted.nbytes
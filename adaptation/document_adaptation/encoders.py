@@ -0,0 +1,161 @@
+"""
+    encoders.py: sentence encoders used by the extractive summarizer, computing the
+        hidden-state embedding of many sentences with padded, length-bucketed batches
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import os
+import numpy as np
+import torch
+from .atomic_file import atomic_write
+
+try:
+    import onnxruntime
+except ImportError:
+    onnxruntime = None
+
+
+class TorchEncoder():
+    """
+    Sentence embeddings taken from a hidden layer of a transformer, reduced over the tokens
+    as bert-extractive-summarizer does, but encoding many sentences per forward pass
+    """
+    def __init__(self, model, tokenizer, hidden=-2, reduce_option='mean', batch_size=16, max_tokens=512):
+        """
+        @param model: transformers model loaded with output_hidden_states=True
+        @param tokenizer: tokenizer of the model
+        @param hidden: index of the hidden layer used as embedding
+        @param reduce_option: 'mean', 'max' or 'median' over the tokens of the sentence
+        @param batch_size: number of sentences per forward pass
+        @param max_tokens: longer sentences are truncated
+        """
+        self.model = model
+        self.tokenizer = tokenizer
+        self.hidden = hidden
+        self.reduce_option = reduce_option
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.pad_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else 0
+        self.model.eval()
+
+    def tokenize(self, sentences):
+        """ @return list of token ids of each sentence, without special tokens like the summarizer """
+        ids = []
+        for sentence in sentences:
+            tokens = self.tokenizer.convert_tokens_to_ids(self.tokenizer.tokenize(sentence))
+            ids.append(tokens[:self.max_tokens] or [self.pad_id])
+        return ids
+
+    def batches(self, ids):
+        """
+        Group sentences of similar length, so that padding is small
+        @return list of (indices of the sentences, input_ids, attention_mask)
+        """
+        order = sorted(range(len(ids)), key=lambda i: len(ids[i]))
+        batches = []
+        for start in range(0, len(order), self.batch_size):
+            indices = order[start:start + self.batch_size]
+            length = max(len(ids[i]) for i in indices)
+            input_ids = np.full((len(indices), length), self.pad_id, dtype=np.int64)
+            attention_mask = np.zeros((len(indices), length), dtype=np.int64)
+            for row, i in enumerate(indices):
+                input_ids[row, :len(ids[i])] = ids[i]
+                attention_mask[row, :len(ids[i])] = 1
+            batches.append((indices, input_ids, attention_mask))
+        return batches
+
+    def reduce(self, states, attention_mask):
+        """
+        Reduce the hidden states of the tokens of each sentence, ignoring padding
+        @param states: float array (batch x tokens x hidden size)
+        @param attention_mask: int array (batch x tokens)
+        """
+        mask = attention_mask.astype(bool)
+        if self.reduce_option == 'max':
+            return np.where(mask[:, :, None], states, -np.inf).max(axis=1)
+        if self.reduce_option == 'median':
+            return np.stack([np.median(s[m], axis=0) for s, m in zip(states, mask)])
+        return (states * mask[:, :, None]).sum(axis=1) / mask.sum(axis=1, keepdims=True)
+
+    def forward(self, input_ids, attention_mask):
+        """ @return hidden states of the selected layer as numpy array """
+        with torch.no_grad():
+            outputs = self.model(torch.from_numpy(input_ids), attention_mask=torch.from_numpy(attention_mask))
+        return outputs[-1][self.hidden].numpy()
+
+    def encode(self, sentences):
+        """
+        @param sentences: list of strings
+
+        @return float32 matrix with one embedding per sentence
+        """
+        embeddings = None
+        for indices, input_ids, attention_mask in self.batches(self.tokenize(sentences)):
+            states = self.reduce(self.forward(input_ids, attention_mask), attention_mask)
+            if embeddings is None:
+                embeddings = np.zeros((len(sentences), states.shape[1]), dtype=np.float32)
+            embeddings[indices] = states
+        if embeddings is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return embeddings
+
+
+class HiddenLayer(torch.nn.Module):
+    """ Wraps a transformers model so that its only output is the hidden layer read by the summarizer """
+    def __init__(self, model, hidden):
+        super().__init__()
+        self.model = model
+        self.hidden = hidden
+
+    def forward(self, input_ids, attention_mask):
+        return self.model(input_ids, attention_mask=attention_mask)[-1][self.hidden]
+
+
+class OnnxEncoder(TorchEncoder):
+    """
+    TorchEncoder running the model with onnxruntime (CPU execution provider).
+    The model, up to the hidden layer used by the summarizer, is exported to ONNX the first time
+    and the exported file is reused afterwards.
+    """
+    def __init__(self, model, tokenizer, path, hidden=-2, reduce_option='mean', batch_size=16, max_tokens=512,
+                 intra_op_threads=0, inter_op_threads=0):
+        """
+        @param path: ONNX file of the model, exported if missing
+        @param intra_op_threads: threads used inside an operator, 0 lets onnxruntime decide
+        @param inter_op_threads: threads used across operators, 0 lets onnxruntime decide
+        (other parameters as TorchEncoder)
+        """
+        super().__init__(model, tokenizer, hidden, reduce_option, batch_size, max_tokens)
+        if onnxruntime is None:
+            raise ImportError("onnxruntime is not installed")
+        self.path = path
+        if not os.path.exists(path):
+            self.export()
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+
+    def export(self):
+        input_ids = torch.full((2, 8), self.pad_id, dtype=torch.int64)
+        attention_mask = torch.ones((2, 8), dtype=torch.int64)
+
+        def write(tmp_path):
+            with torch.no_grad():
+                torch.onnx.export(HiddenLayer(self.model, self.hidden), (input_ids, attention_mask), tmp_path,
+                                  input_names=['input_ids', 'attention_mask'], output_names=['hidden'],
+                                  dynamic_axes={'input_ids': {0: 'batch', 1: 'tokens'},
+                                                'attention_mask': {0: 'batch', 1: 'tokens'},
+                                                'hidden': {0: 'batch', 1: 'tokens'}},
+                                  opset_version=14)
+        # a failed export (the fallback to torch) leaves no partial model behind
+        atomic_write(self.path, write)
+        print("Exported encoder to {}".format(self.path))
+
+    def forward(self, input_ids, attention_mask):
+        return self.session.run(['hidden'], {'input_ids': input_ids, 'attention_mask': attention_mask})[0]
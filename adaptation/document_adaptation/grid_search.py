@@ -12,9 +12,12 @@ import sys
 sys.path.append('./')
 
 from document_adaptation import DocumentsAdaptation, User
-from config import config
-from copy import deepcopy
+from config import config, Struct
 from pprint import pprint
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import itertools
+import argparse
 import json
 import glob
 import os
@@ -23,12 +26,21 @@ import os
 RESULT_DIR = '/tmp/'
 INPUT_FILES = ['./data/ir_1575387713.4855616.json']
 
+PARAMS_EXPERTISE_WEIGHT = [0, 0.3, 0.5, 0.7, 1, 2]
+PARAMS_IR_SCORE_WEIGHT = [0, 0.3, 0.5, 0.7, 1]
+PARAMS_AFFINITY_WEIGHT = [0, 0.3, 0.5, 0.7, 1]
+
+# no autosave thread: sweep forks its process pool after this, the workers must not inherit its lock
 document_adaptation = DocumentsAdaptation(config,
                                           max_workers=4,
-                                          verbose=config.debug)
+                                          verbose=config.debug,
+                                          autosave=False)
 
 print("Must be launched from root of adaptation's folder! \n\n")
 
+# weight independent state of the file being swept, inherited by the forked workers
+_sweep_state = None
+
 
 def test_on_config(config, path):
     document_adaptation.update_config(config)
@@ -50,30 +62,72 @@ def test_on_config(config, path):
     return results
 
 
-def main():
-    params_expertise_weight = [0, 0.3, 0.5, 0.7, 1, 2]
-    params_IR_score_weight = [0, 0.3, 0.5, 0.7, 1]
-    params_affinity_weight = [0, 0.3, 0.5, 0.7, 1]
+def selection_key(selection):
+    """ Sentences selected for each keyword, identical keys give identical summaries """
+    return tuple((keyword, tuple(s.index for s in sentences)) for keyword, sentences in selection.items())
+
+
+def _select(params):
+    scores, user = _sweep_state
+    expertise, ir, affinity = params
+    scores.weigh(Struct(expertise_weight=expertise, IR_score_weight=ir, affinity_weight=affinity))
+    return document_adaptation.select_sentences(scores, user)
+
+
+def _summarize_in_worker(params):
+    _, user = _sweep_state
+    return document_adaptation.write_tailored_text(_select(params), user, use_transitions=False)
+
+
+def sweep(path, combinations, workers=1):
+    """
+    Tailored text of a file for many weight combinations. The analysis, embeddings, readability and
+    affinities are computed once; each combination only re-weighs the scores and re-runs the policy,
+    and combinations selecting the same sentences share one summarization, run in a process pool.
+    @param path: IR results file
+    @param combinations: list of (expertise_weight, IR_score_weight, affinity_weight)
+    @param workers: number of processes summarizing
+
+    @return list of dictionaries with expertise, ir, affinity and text
+    """
+    global _sweep_state
+    with open(path) as file:
+        req = json.load(file)
+    user = User(req["userProfile"])
+    document_adaptation.language_assertion(user.language)
+    scores = document_adaptation.get_salient_scores(req['results'], user)
+    if scores is None:
+        return [{'expertise': i, 'ir': j, 'affinity': k, 'text': "Sorry,\nit is not art."}
+                for i, j, k in combinations]
+    _sweep_state = (scores, user)
+    # load the models before forking
+    document_adaptation.get_summarizer(user.language)
+
+    # the policy is cheap, group the combinations by the sentences they select
+    groups = {}
+    for params in combinations:
+        groups.setdefault(selection_key(_select(params)), []).append(params)
+    representatives = [group[0] for group in groups.values()]
+    print("{}: {} combinations, {} distinct selections".format(path, len(combinations), len(representatives)))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as executor:
+            texts = list(executor.map(_summarize_in_worker, representatives))
+    else:
+        texts = [_summarize_in_worker(params) for params in representatives]
 
     results = []
-    new_config = deepcopy(config)
-    for file in INPUT_FILES:
-        for i in params_expertise_weight:
-            for j in params_IR_score_weight:
-                for k in params_affinity_weight:
-                    new_config = config
-                    new_config.expertise_weight = i
-                    new_config.IR_score_weight = j
-                    new_config.affinity_weight = k
-
-                    text = test_on_config(config, file)
-                    results.append({
-                        'expertise': i,
-                        'ir': j,
-                        'affinity': k,
-                        'text': text
-                    })
-        unique_texts = list(set([r['text'] for r in results]))
+    for group, text in zip(groups.values(), texts):
+        for i, j, k in group:
+            results.append({'expertise': i, 'ir': j, 'affinity': k, 'text': text or "Sorry,\nit is not art."})
+    return results
+
+
+def main(input_files=INPUT_FILES, result_dir=RESULT_DIR, workers=1):
+    combinations = list(itertools.product(PARAMS_EXPERTISE_WEIGHT, PARAMS_IR_SCORE_WEIGHT, PARAMS_AFFINITY_WEIGHT))
+    for file in input_files:
+        results = sweep(file, combinations, workers=workers)
+        unique_texts = list(dict.fromkeys(r['text'] for r in results))
         aggregate_results = []
         for u in unique_texts:
             params = []
@@ -100,7 +154,7 @@ def main():
                         index, j['expertise'], j['ir'], j['affinity'])
                 ]
             plain_text += ['-' * 50]
-        out_path = os.path.join(RESULT_DIR, os.path.basename(file) + '.txt')
+        out_path = os.path.join(result_dir, os.path.basename(file) + '.txt')
         print('Output ready for {}'.format(out_path))
         with open(out_path, 'wt') as out:
             pprint(plain_text, stream=out)
@@ -113,5 +167,18 @@ def test_all():
         test_on_config(config, path)
 
 
-#main()
-test_all()
\ No newline at end of file
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Grid search of the weights of the final score')
+    parser.add_argument('--files', type=str, nargs='*', default=INPUT_FILES,
+                        help='IR results files to sweep')
+    parser.add_argument('--result-dir', type=str, default=RESULT_DIR,
+                        help='directory of the outputs')
+    parser.add_argument('--workers', type=int, default=4,
+                        help='number of processes summarizing the distinct selections')
+    parser.add_argument('--test-all', action='store_true',
+                        help='only run every ./data/ir_*.json file end to end with the current config')
+    args = parser.parse_args()
+    if args.test_all:
+        test_all()
+    else:
+        main(args.files, args.result_dir, args.workers)
@@ -0,0 +1,110 @@
+"""
+    keyword_expansion.py: expansion of the user's tastes with the nearest words of the fastText
+        vocabulary, using an approximate nearest neighbours index (hnswlib, numpy if not installed)
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import threading
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    hnswlib = None
+
+
+def normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return np.divide(vectors, norms, out=np.zeros_like(vectors), where=norms > 0)
+
+
+class KeywordExpander():
+    """
+    Nearest words of a taste by cosine similarity, among the most frequent words of the vocabulary
+    of a SisterEmbedder. Results are cached per taste, since tastes come from a small set.
+    """
+    def __init__(self, embedder, stopwords=[], max_words=50000, min_count=5, k=5, min_similarity=0.5,
+                 ef=64, M=16, verbose=False):
+        """
+        @param embedder: SisterEmbedder of the language
+        @param stopwords: words never returned as expansion
+        @param max_words: number of words of the vocabulary indexed, most frequent first
+        @param min_count: frequency floor of the indexed words
+        @param k: maximum number of expansions of a taste
+        @param min_similarity: minimum cosine similarity of an expansion
+        @param ef, M: parameters of the HNSW index (search breadth and links per node)
+        """
+        self.embedder = embedder
+        self.k = k
+        self.min_similarity = min_similarity
+        self.verbose = verbose
+        self.cache = {}
+        self.lock = threading.Lock()
+
+        stopwords = set(w.lower() for w in stopwords)
+        words, counts = embedder.vocabulary()
+        self.words = []
+        for word, count in zip(words, counts):
+            if count < min_count or len(self.words) >= max_words:
+                break
+            if word.isalpha() and len(word) > 2 and word.lower() not in stopwords:
+                self.words.append(word)
+        vectors = normalize_rows(np.asarray(embedder.word_vectors(self.words), dtype=np.float32))
+
+        self.index = None
+        self.vectors = None
+        if hnswlib is not None and self.words:
+            self.index = hnswlib.Index(space='ip', dim=vectors.shape[1])
+            self.index.init_index(max_elements=len(self.words), ef_construction=200, M=M)
+            self.index.add_items(vectors, np.arange(len(self.words)))
+            self.index.set_ef(max(ef, k * 4))
+        else:
+            self.vectors = vectors
+        if self.verbose:
+            print("Keyword expansion index: {} words ({})".format(
+                len(self.words), 'hnswlib' if self.index is not None else 'numpy'))
+
+    def nearest(self, vector, n):
+        """ @return (indices of the words, cosine similarities) of the n nearest words """
+        n = min(n, len(self.words))
+        if n == 0:
+            return [], []
+        if self.index is not None:
+            labels, distances = self.index.knn_query(vector[None, :], k=n)
+            return labels[0], 1 - distances[0]
+        similarities = self.vectors @ vector
+        top = np.argpartition(-similarities, n - 1)[:n]
+        top = top[np.argsort(-similarities[top])]
+        return top, similarities[top]
+
+    def expand(self, taste):
+        """
+        @param taste: user's taste (one or more words)
+
+        @return list with the taste followed by its expansions
+        """
+        with self.lock:
+            if taste in self.cache:
+                return self.cache[taste]
+        vector = normalize_rows(np.asarray(self.embedder.embed_batch([taste]), dtype=np.float32))[0]
+        expansions = [taste]
+        if vector.any():
+            taste_words = set(taste.lower().split())
+            # some neighbours are variants of the taste itself
+            labels, similarities = self.nearest(vector, self.k + len(taste_words) + 5)
+            seen = set(taste_words)
+            for label, similarity in zip(labels, similarities):
+                word = self.words[label]
+                if similarity < self.min_similarity or len(expansions) > self.k:
+                    break
+                if word.lower() in seen:
+                    continue
+                seen.add(word.lower())
+                expansions.append(word)
+        with self.lock:
+            self.cache[taste] = expansions
+        return expansions
@@ -0,0 +1,177 @@
+"""
+    language_registry.py: lazy loading of the models of each language,
+        keeping only the most recently used languages in memory
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import threading
+import time
+from collections import OrderedDict
+import spacy
+from spacy_readability import Readability
+
+
+class LanguageModels():
+    """
+    Models needed to adapt documents of a language:
+        * summarizer: ModelSummarizer
+        * embedder: SisterEmbedder
+        * nlp: spacy pipeline with Readability
+        * expander: KeywordExpander, built on first use
+    """
+    def __init__(self, summarizer, embedder, nlp):
+        self.summarizer = summarizer
+        self.embedder = embedder
+        self.nlp = nlp
+        self.expander = None
+
+
+class LanguageRegistry():
+    """
+    Loads the models of a language on first use and keeps at most max_loaded languages in memory,
+    evicting the least recently used one
+    """
+    def __init__(self, loader, max_loaded=None, on_change=None, verbose=False):
+        """
+        @param loader: function lang -> LanguageModels
+        @param max_loaded: maximum number of resident languages, no limit if None
+        @param on_change: function (loaded_lang, evicted_langs) called after each load
+        """
+        self.loader = loader
+        self.max_loaded = max_loaded
+        self.on_change = on_change
+        self.verbose = verbose
+        self.models = OrderedDict()
+        self.lock = threading.Lock()
+        self.loading = {}
+
+    def get(self, lang):
+        """
+        @param lang: language abbreviation (e.g. "en")
+
+        @return LanguageModels of the language, loading them if needed
+        """
+        with self.lock:
+            if lang in self.models:
+                self.models.move_to_end(lang)
+                return self.models[lang]
+            lang_lock = self.loading.setdefault(lang, threading.Lock())
+
+        # only one thread loads a language, the others wait for it
+        with lang_lock:
+            with self.lock:
+                if lang in self.models:
+                    self.models.move_to_end(lang)
+                    return self.models[lang]
+
+            time_start = time.time()
+            models = self.loader(lang)
+            if self.verbose:
+                print("Loaded '{}' models in {:.1f}s".format(lang, time.time() - time_start))
+
+            evicted = []
+            with self.lock:
+                self.models[lang] = models
+                while self.max_loaded and len(self.models) > self.max_loaded:
+                    evicted.append(self.models.popitem(last=False)[0])
+            if evicted and self.verbose:
+                print("Evicted models of {}".format(evicted))
+            if self.on_change:
+                self.on_change(lang, evicted)
+        return models
+
+    def preload(self, languages):
+        for lang in languages:
+            self.get(lang)
+
+    def loaded(self):
+        with self.lock:
+            return list(self.models)
+
+    def items(self):
+        """ @return list of (language, LanguageModels) of the resident languages """
+        with self.lock:
+            return list(self.models.items())
+
+
+class PipelineRegistry():
+    """
+    spacy pipelines, each one loaded only once with Readability attached and shared by all the requests.
+    Languages without a dedicated model use the multi-language one (fallback).
+    """
+    def __init__(self, model_names, fallback='multi', verbose=False):
+        """
+        @param model_names: dictionary language -> spacy model name
+        @param fallback: key of model_names used for the other languages
+        """
+        self.model_names = model_names
+        self.fallback = fallback
+        self.verbose = verbose
+        self.pipelines = {}
+        self.load_time = {}
+        self.hits = {}
+        self.fallback_hits = {}
+        self.lock = threading.Lock()
+        self.loading = {}
+
+    def model_name(self, lang):
+        return self.model_names.get(lang, self.model_names[self.fallback])
+
+    def get(self, lang):
+        """
+        @param lang: language abbreviation (e.g. "en")
+
+        @return spacy pipeline with Readability
+        """
+        name = self.model_name(lang)
+        with self.lock:
+            self.hits[name] = self.hits.get(name, 0) + 1
+            if lang not in self.model_names:
+                self.fallback_hits[lang] = self.fallback_hits.get(lang, 0) + 1
+                if self.verbose:
+                    print("No spacy model for '{}', using {} (fallback hits: {})".format(
+                        lang, name, self.fallback_hits[lang]))
+            if name in self.pipelines:
+                return self.pipelines[name]
+            name_lock = self.loading.setdefault(name, threading.Lock())
+
+        with name_lock:
+            with self.lock:
+                if name in self.pipelines:
+                    return self.pipelines[name]
+            time_start = time.time()
+            nlp = spacy.load(name)
+            nlp.add_pipe(Readability(), last=True)
+            with self.lock:
+                self.pipelines[name] = nlp
+                self.load_time[name] = time.time() - time_start
+            print("Loaded spacy model {} in {:.1f}s".format(name, self.load_time[name]))
+        return nlp
+
+    def discard(self, languages, keep=[]):
+        """
+        Drop the pipelines of some languages, unless they are used by a language in keep
+        """
+        keep = set(self.model_name(l) for l in keep)
+        with self.lock:
+            for name in set(self.model_name(l) for l in languages) - keep:
+                self.pipelines.pop(name, None)
+
+    def stats(self):
+        """
+        @return dictionary with load time and hits of each pipeline and hits of each language using the fallback
+        """
+        with self.lock:
+            return {
+                'pipelines': {
+                    name: {'loaded': name in self.pipelines,
+                           'load_time': self.load_time.get(name),
+                           'hits': self.hits.get(name, 0)}
+                    for name in set(self.hits) | set(self.load_time)
+                },
+                'fallback_hits': dict(self.fallback_hits)
+            }
@@ -0,0 +1,165 @@
+"""
+    near_duplicates.py: detection of near-duplicate texts (mirror pages, sentences differing
+        in a few words, whitespace or citations) with SimHash fingerprints and an LSH index
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+BITS = 64
+CITATION_RE = re.compile(r'\[[^\]]*\]')
+WORD_RE = re.compile(r'\w+')
+BIT_POSITIONS = np.arange(BITS, dtype=np.uint64)
+# shingles of single words for sentences: with 3-word shingles one inserted word already flips ~11 bits
+SENTENCE_SHINGLE_SIZE = 1
+# words that change the meaning of a sentence (english and italian), see same_facts
+NEGATIONS = frozenset([
+    'not', 'no', 'never', 'nor', 'none', 'nothing', 'neither', 'nobody', 'nowhere', 'without', 'cannot',
+    'isn', 'aren', 'wasn', 'weren', 'don', 'doesn', 'didn', 'won', 'wouldn', 'shouldn', 'couldn',
+    'hasn', 'haven', 'hadn', 'non', 'mai', 'nessuno', 'nessuna', 'niente', 'nulla', 'né', 'senza'])
+
+
+def tokens(text):
+    """ @return lower case words of a text, citations like [1] excluded """
+    return WORD_RE.findall(CITATION_RE.sub(' ', text.lower()))
+
+
+def feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def simhash(text, shingle_size=3):
+    """
+    SimHash of the word shingles of a text: similar texts have fingerprints with a small Hamming distance
+    @param text: string
+    @param shingle_size: number of words of each feature
+
+    @return 64 bit integer
+    """
+    words = tokens(text)
+    if not words:
+        return 0
+    size = min(shingle_size, len(words))
+    features = set(' '.join(words[i:i + size]) for i in range(len(words) - size + 1))
+    hashes = np.array([feature_hash(f) for f in features], dtype=np.uint64)
+    bits = (hashes[:, None] >> BIT_POSITIONS) & np.uint64(1)
+    majority = bits.sum(axis=0) * 2 > len(hashes)
+    return int((majority.astype(np.uint64) << BIT_POSITIONS).sum())
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+def same_facts(a, b):
+    """
+    SimHash cannot tell an inserted "also" from an inserted "not": two near-duplicate sentences
+    are merged only if the words they do not share include no number and no negation
+    @param a, b: strings
+
+    @return True if a and b state the same facts
+    """
+    different = set(tokens(a)) ^ set(tokens(b))
+    return not any(word in NEGATIONS or any(c.isdigit() for c in word) for word in different)
+
+
+class NearDuplicateIndex():
+    """
+    LSH index of SimHash fingerprints. The 64 bits are split in max_distance + 1 bands:
+    two fingerprints within max_distance bits agree on at least one band, so only the
+    fingerprints sharing a band are compared.
+    """
+    def __init__(self, max_distance=3):
+        """
+        @param max_distance: maximum Hamming distance between fingerprints of near duplicates
+        """
+        self.max_distance = max_distance
+        num_bands = min(max_distance + 1, BITS)
+        bounds = np.linspace(0, BITS, num_bands + 1).astype(int)
+        self.bands = [(int(start), (1 << int(end - start)) - 1) for start, end in zip(bounds[:-1], bounds[1:])]
+        self.buckets = [{} for _ in self.bands]
+        self.fingerprints = {}
+        self.texts = {}
+
+    def band_keys(self, fingerprint):
+        return [(fingerprint >> start) & mask for start, mask in self.bands]
+
+    def query(self, fingerprint, text=None, confirm=None):
+        """
+        @param text: text of the fingerprint, passed to confirm
+        @param confirm: function (text, indexed text) -> bool checking each candidate (e.g. same_facts)
+
+        @return id of an indexed near duplicate of the fingerprint, or None
+        """
+        for bucket, key in zip(self.buckets, self.band_keys(fingerprint)):
+            for item in bucket.get(key, []):
+                if hamming(fingerprint, self.fingerprints[item]) <= self.max_distance and \
+                        (confirm is None or confirm(text, self.texts[item])):
+                    return item
+        return None
+
+    def add(self, fingerprint, item, text=None):
+        self.fingerprints[item] = fingerprint
+        if text is not None:
+            self.texts[item] = text
+        for bucket, key in zip(self.buckets, self.band_keys(fingerprint)):
+            bucket.setdefault(key, []).append(item)
+
+
+class FingerprintCache():
+    """
+    SimHash of texts keyed by the hash of their content, so that the pages seen by previous requests
+    are not tokenized again
+    """
+    def __init__(self, max_entries=10000, shingle_size=3):
+        self.max_entries = max_entries
+        self.shingle_size = shingle_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, text):
+        """ @return SimHash of the text (see simhash) """
+        key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+        with self.lock:
+            fingerprint = self.entries.get(key)
+            if fingerprint is not None:
+                self.entries.move_to_end(key)
+                return fingerprint
+        fingerprint = simhash(text, self.shingle_size)
+        with self.lock:
+            self.entries[key] = fingerprint
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return fingerprint
+
+
+def unique(texts, max_distance=3, index=None, shingle_size=3, fingerprints=None, confirm=None):
+    """
+    Positions of the texts that are not near duplicates of a previous one
+    @param texts: list of strings, in order of preference
+    @param max_distance: maximum Hamming distance between SimHash fingerprints of near duplicates
+    @param index: NearDuplicateIndex shared across calls, e.g. to dedupe the sentences of many documents
+    @param shingle_size: number of words of each feature (SENTENCE_SHINGLE_SIZE for sentences)
+    @param fingerprints: FingerprintCache used instead of computing the SimHash of each text
+    @param confirm: function (text, previous text) -> bool checking the near duplicates found (e.g. same_facts)
+
+    @return list of positions in texts
+    """
+    if index is None:
+        index = NearDuplicateIndex(max_distance)
+    keep = []
+    for position, text in enumerate(texts):
+        fingerprint = fingerprints.get(text) if fingerprints is not None else simhash(text, shingle_size)
+        if index.query(fingerprint, text, confirm) is not None:
+            continue
+        index.add(fingerprint, len(index.fingerprints), text if confirm is not None else None)
+        keep.append(position)
+    return keep
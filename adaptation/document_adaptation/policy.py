@@ -8,7 +8,9 @@
 """
 
 from sklearn.metrics.pairwise import cosine_similarity
+from scipy.optimize import linear_sum_assignment
 import json
+import re
 import numpy as np
 
 import matplotlib.pyplot as plt
@@ -19,7 +21,7 @@ from .visualizer import Visualizer
 '''
 Usage: chiamate auto() e print_results(n) per stampare i primi n risultati per ogni chiave
 Inizialmente la classe Policy elimina i duplicati da sentences (lista di SalientSentence) e toglie alcune frasi
-seguendo delle regole fisse (che trovate nella funzione heuristic_filter). Dopoddichè la classe policy crea un 
+seguendo delle regole fisse (che trovate nella funzione filter_sentences). Dopoddichè la classe policy crea un 
 dizionario dove la chiave è la keyword con la quale ho trovato i documenti che contenevano quelle frasi. Poi per ogni
 elemento viene calcolato quanto quello assimiglia ai gusti generali dell'utente e ogni lista viene ordinata. Con print
 results possiamo scegliere quanti elementi vogliamo visualizzare.
@@ -28,34 +30,61 @@ Migliorie: così creo cluster basandomi su tutte le keyword, ma noi vogliamo sol
 
 
 class Policy:
-    def __init__(self, sentences, user, max_cluster_size):
+    def __init__(self, sentences, user, max_cluster_size, algorithm='greedy'):
+        """
+        @param sentences: list of SalientSentence
+        @param user: User
+        @param max_cluster_size: maximum number of sentences assigned to a taste
+        @param algorithm: 'greedy' (create_cluster_greedy) or 'assignment' (create_cluster_ILP)
+        """
         self.sentences = sentences
+        self.algorithm = algorithm
         self.user = user
         self.user_taste_embedded = user.tastes_embedded
         self.user_taste_embedded_summed = []
         self.tastes = list(self.user_taste_embedded.keys())
         self.clusters = {}
         self.results = {}
+        self.filter_counts = {}
         self.max_cluster_size = min(int(len(sentences) / len(user.tastes)),
                                     max_cluster_size)
 
-    def eliminate_duplicates(self):
-        for a in self.sentences:
-            for b in self.sentences:
-                if a.sentence == b.sentence:
-                    if a != b:
-                        self.sentences.remove(b)
-
-    def heuristic_filter(self):
-        for a in self.sentences:
-            if len(a.sentence) < 100:
-                self.sentences.remove(a)
-                continue
-            if len(a.sentence) > 1000:
-                self.sentences.remove(a)
-                continue
-            if '^' or '>' or '<' in a.sentence:
-                self.sentences.remove(a)
+    min_length = 100
+    max_length = 1000
+    forbidden_chars = re.compile(r'[\^<>]')
+
+    @staticmethod
+    def normalize(sentence):
+        """ Sentence used to find duplicates: lower case, with single spaces """
+        return ' '.join(sentence.lower().split())
+
+    def filter_sentences(self):
+        """
+        Remove, in a single pass, duplicated sentences and the ones that are too short, too long
+        or contain markup characters. The number of sentences removed by each rule is kept in self.filter_counts.
+        """
+        texts = [s.sentence for s in self.sentences]
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        too_short = lengths < self.min_length
+        too_long = lengths > self.max_length
+        markup = np.fromiter((self.forbidden_chars.search(t) is not None for t in texts), dtype=bool, count=len(texts))
+        seen = set()
+        duplicate = np.zeros(len(texts), dtype=bool)
+        for i, t in enumerate(texts):
+            key = self.normalize(t)
+            duplicate[i] = key in seen
+            seen.add(key)
+        keep = ~(duplicate | too_short | too_long | markup)
+        self.filter_counts = {
+            'input': len(texts),
+            'duplicate': int(duplicate.sum()),
+            'too_short': int((too_short & ~duplicate).sum()),
+            'too_long': int((too_long & ~duplicate).sum()),
+            'markup': int((markup & ~(duplicate | too_short | too_long)).sum()),
+            'kept': int(keep.sum())
+        }
+        self.sentences = [s for s, k in zip(self.sentences, keep) if k]
+        return self.filter_counts
 
     def create_cluster_greedy(self):
         '''
@@ -75,7 +104,7 @@ class Policy:
                 tastes[k].append(s)
         for t in tastes:
             tastes[t].sort(key=lambda x: x.score[t], reverse=True)
-        sorted(tastes, key=lambda x: len(x))
+        tastes = dict(sorted(tastes.items(), key=lambda x: len(x[1])))
         result = {t: [] for t in self.user.tastes}
         for t in tastes:
             for s in tastes[t]:
@@ -92,9 +121,55 @@ class Policy:
         Given the user tastes and the salient sentences it returns a list ok K(K selected as parameter)
         best sentences for each user taste.
         We translate this problem to an integer graph optimization prbolem. 
-        The idea is to use integer linear programming for the task.
+        Each taste is replicated max_cluster_size times, so that the problem becomes a rectangular
+        assignment (sentences x taste slots) maximizing the total score, solved with the Hungarian algorithm.
+        Pairs where the sentence's document was not retrieved for the taste get a big cost, so they are
+        chosen only when nothing else is left and then dropped.
         '''
-        pass
+        tastes = list(self.user.tastes)
+        result = {t: [] for t in tastes}
+        self.results = result
+        if not tastes or not self.sentences or self.max_cluster_size <= 0:
+            return
+
+        # dense matrix sentences x tastes from the scores of the request
+        scores = self.sentences[0].scores
+        rows = np.array([s.index for s in self.sentences])
+        score = np.zeros((len(rows), len(tastes)), dtype=np.float64)
+        eligible = np.zeros((len(rows), len(tastes)), dtype=bool)
+        for j, t in enumerate(tastes):
+            column = scores.columns.get(t)
+            if column is not None:
+                score[:, j] = scores.score[rows, column]
+                eligible[:, j] = scores.mask[rows, column]
+        if not eligible.any():
+            return
+
+        # at most slots sentences are assigned, so an optimal solution only uses
+        # sentences that are among the best slots ones of some taste
+        slots = len(tastes) * self.max_cluster_size
+        if len(rows) > slots:
+            ranked = np.where(eligible, score, -np.inf)
+            candidates = np.unique(np.argpartition(-ranked, slots - 1, axis=0)[:slots])
+            candidates = candidates[eligible[candidates].any(axis=1)]
+        else:
+            candidates = np.arange(len(rows))
+        score, eligible = score[candidates], eligible[candidates]
+
+        cost = -score
+        low, high = cost[eligible].min(), cost[eligible].max()
+        big_m = (high - low + 1) * (slots + 1)
+        cost[~eligible] = high + big_m
+        cost = np.repeat(cost, self.max_cluster_size, axis=1)
+        assigned_rows, assigned_slots = linear_sum_assignment(cost)
+        assigned_tastes = assigned_slots // self.max_cluster_size
+        keep = eligible[assigned_rows, assigned_tastes]
+
+        for i, j in zip(candidates[assigned_rows[keep]], assigned_tastes[keep]):
+            self.sentences[i].assigned = True
+            result[tastes[j]].append(self.sentences[i])
+        for j, t in enumerate(tastes):
+            result[t].sort(key=lambda x: x.scores.score[x.index, scores.columns[t]], reverse=True)
 
     def create_clusters(self):
         for taste in self.tastes:
@@ -122,16 +197,17 @@ class Policy:
                                            key=lambda tup: tup[0])
 
     def auto(self, debug=False, pca=False):
-        self.eliminate_duplicates()
-        self.heuristic_filter(
-        )  # Toglie le frasi insensate dall'input della classe
+        self.filter_sentences()  # Toglie i duplicati e le frasi insensate dall'input della classe
         #self.create_clusters()  # In self.clusters crea un dizionario keyword - frasi
         #self.sum_user_tastes_embedded()
         #self.apply_policy()  # Usa il criterio readibility - similiarity per ordinare le frasi
         self.max_cluster_size = min(
             int(len(self.sentences) / len(self.user.tastes)),
             self.max_cluster_size)
-        self.create_cluster_greedy()
+        if self.algorithm == 'assignment':
+            self.create_cluster_ILP()
+        else:
+            self.create_cluster_greedy()
         if pca:
             self.PCA_dimention_reduction()
         if debug:
@@ -139,9 +215,10 @@ class Policy:
 
     def sum_user_tastes_embedded(self):
         keys = list(self.user_taste_embedded.keys())
+        # not in place: the embeddings are shared by all the users (see TasteEmbeddings)
         aux = self.user_taste_embedded[keys[0]]
         for key in keys[1:]:
-            aux += self.user_taste_embedded[key]
+            aux = aux + self.user_taste_embedded[key]
         self.user_taste_embedded_summed = aux
 
     def print_results(self, n):
@@ -155,19 +232,21 @@ class Policy:
         vectors = []
         metadata = []
         total_points = 0
+        selected = set()
         # Adding sentences in cluster
         for taste in self.results:
             vectors.append(np.squeeze(self.user_taste_embedded[taste]))
             metadata.append([taste, taste, -1, {}, True])
             total_points += 1
             for sentence in self.results[taste]:
+                selected.add(id(sentence))
                 vectors.append(sentence.sentence_embedding)
                 metadata.append([taste, sentence.sentence, sentence.score, {'readability':sentence.readibility, 'ir_score':sentence.IR_score},  False])
                 total_points += 1
         # Adding other sentences with upperbound
         upperbound = 100
         for sentence in self.sentences:
-            if not any((sentence.sentence_embedding == x).all() for x in vectors):
+            if id(sentence) not in selected:
                 vectors.append(sentence.sentence_embedding)
                 metadata.append(["_None_", sentence.sentence, sentence.score, {'readability':sentence.readibility, 'ir_score':sentence.IR_score}, False])
                 total_points += 1
@@ -175,7 +254,7 @@ class Policy:
             if upperbound < 0:
                 break
        
-        # Append to visualizer file
+        # Queue for the visualizer file, written in background
         Visualizer.add_embedding(vectors, metadata, metadata_header=["Class", "Sentences", "Policy score", "Scores", "Is Taste"])
 
     def PCA_dimention_reduction(self, n_components=2):
@@ -0,0 +1,59 @@
+"""
+    quantization.py: int8 dynamic quantization of the summarization models for CPU inference,
+        with the quantized weights cached on disk
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import os
+import inspect
+import torch
+from .atomic_file import atomic_write
+
+# torch >= 1.13 can restrict what torch.load unpickles, the quantized state_dict needs the full unpickler
+LOAD_KWARGS = {'weights_only': False} if 'weights_only' in inspect.signature(torch.load).parameters else {}
+
+
+def quantize(model):
+    """
+    Replace the Linear layers of a model with int8 dynamically quantized ones
+    @param model: torch model
+
+    @return quantized model in eval mode
+    """
+    model.eval()
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def quantized_path(cache_dir, model_name):
+    return os.path.join(cache_dir, model_name.replace('/', '_') + '.int8.pt')
+
+
+def load_quantized(model_class, model_name, cache_dir):
+    """
+    Load a pretrained transformers model quantized to int8.
+    The first time the fp32 model is quantized and its weights are saved in cache_dir,
+    then the quantized weights are loaded directly.
+    @param model_class: transformers model class (e.g. RobertaModel)
+    @param model_name: name of the pretrained model (e.g. 'distilroberta-base')
+    @param cache_dir: directory of the quantized weights
+
+    @return quantized model with output_hidden_states=True
+    """
+    path = quantized_path(cache_dir, model_name)
+    if os.path.exists(path):
+        model_config = model_class.config_class.from_pretrained(model_name, output_hidden_states=True)
+        model = quantize(model_class(model_config))
+        try:
+            model.load_state_dict(torch.load(path, **LOAD_KWARGS))
+            return model
+        except (OSError, RuntimeError, EOFError, TypeError) as e:
+            print("Could not load quantized model {}: {}".format(path, e))
+
+    model = quantize(model_class.from_pretrained(model_name, output_hidden_states=True))
+    atomic_write(path, lambda tmp_path: torch.save(model.state_dict(), tmp_path))
+    print("Saved quantized model {}".format(path))
+    return model
@@ -0,0 +1,110 @@
+"""
+    readability.py: Flesch-Kincaid reading ease computed with a regex tokenizer and a syllable counter,
+        a fast alternative to the spacy-readability pipe (see config.readability_backend)
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import re
+import inspect
+
+WORD_RE = re.compile(r"[^\W_]+(?:['’.,][^\W_]+)*")
+VOWELS_RE = re.compile(r"[aeiouyàáâäèéêëìíîïòóôöùúûü]+")
+SILENT_E_RE = re.compile(r"[^aeiouyl]e$")
+
+
+def words(sentence):
+    """ @return list of the words of a sentence, punctuation excluded """
+    return WORD_RE.findall(sentence)
+
+
+def count_syllables(word):
+    """
+    Number of syllables of a word, approximated with the groups of vowels
+    @param word: string
+
+    @return integer >= 1 (0 for numbers)
+    """
+    word = word.lower()
+    if word.isdigit():
+        return 0
+    syllables = len(VOWELS_RE.findall(word))
+    if syllables > 1 and SILENT_E_RE.search(word):
+        syllables -= 1
+    return max(syllables, 1)
+
+
+def reading_ease(sentences):
+    """
+    Flesch-Kincaid reading ease of a text
+    @param sentences: list of the sentences of the text (e.g. the TextRank ones, see split_sentences)
+
+    @return float, the higher the easier (0 for an empty text)
+    """
+    num_sentences = 0
+    num_words = 0
+    num_syllables = 0
+    for sentence in sentences:
+        tokens = words(sentence)
+        if not tokens:
+            continue
+        num_sentences += 1
+        num_words += len(tokens)
+        num_syllables += sum(count_syllables(w) for w in tokens)
+    if num_sentences == 0 or num_words == 0:
+        return 0
+    return 206.835 - 1.015 * (num_words / num_sentences) - 84.6 * (num_syllables / num_words)
+
+
+def chunks(text, max_length):
+    """
+    Split a text in pieces shorter than max_length, cutting at line ends or sentence ends when possible
+    @param text: string
+    @param max_length: maximum number of characters of a piece
+
+    @return list of strings
+    """
+    pieces = []
+    start = 0
+    while len(text) - start > max_length:
+        end = start + max_length
+        cut = text.rfind('\n', start, end)
+        if cut <= start:
+            cut = text.rfind('. ', start, end)
+        cut = cut + 1 if cut > start else end
+        pieces.append(text[start:cut])
+        start = cut
+    pieces.append(text[start:])
+    return pieces
+
+
+def spacy_reading_ease(nlp, texts, batch_size=8, n_process=1):
+    """
+    Flesch-Kincaid reading ease of many texts with the spacy-readability pipe, using nlp.pipe.
+    Components not needed by readability are disabled and texts longer than nlp.max_length are
+    processed in chunks, whose scores are averaged weighting them by their number of words.
+    @param nlp: spacy pipeline with Readability
+    @param texts: list of strings
+    @param batch_size: number of texts buffered by nlp.pipe
+    @param n_process: number of processes of nlp.pipe (only for spacy versions supporting it)
+
+    @return list of floats
+    """
+    # readability only needs sentences and tokens
+    disable = [name for name in nlp.pipe_names if name not in ('parser', 'sentencizer', 'readability')]
+    kwargs = {'batch_size': batch_size, 'disable': disable, 'as_tuples': True}
+    if n_process != 1 and 'n_process' in inspect.signature(nlp.pipe).parameters:
+        kwargs['n_process'] = n_process
+
+    pieces = [(piece, index) for index, text in enumerate(texts)
+              for piece in chunks(text, nlp.max_length - 1)]
+    scores = [0.0] * len(texts)
+    words_count = [0] * len(texts)
+    for doc, index in nlp.pipe(pieces, **kwargs):
+        num_words = len([token for token in doc if not token.is_punct])
+        scores[index] += doc._.flesch_kincaid_reading_ease * num_words
+        words_count[index] += num_words
+    return [score / count if count else 0 for score, count in zip(scores, words_count)]
@@ -1,10 +1,11 @@
 import numpy as np
 import scipy
 from rake_nltk import Rake
-from gensim.summarization.summarizer import summarize
-from scipy.spatial import distance
+from gensim.summarization.summarizer import summarize_corpus, _build_corpus, _extract_important_sentences, _format_results
+from gensim.summarization.textcleaner import clean_text_by_sentences
 import sister
 from sister.tokenizers import SimpleTokenizer
+from sister.word_embedders import MmapEmbedding
 def rake(sentence, stopwords):
     # https://pypi.org/project/rake-nltk/
     r = Rake(stopwords=stopwords)
@@ -12,10 +13,45 @@ def rake(sentence, stopwords):
     raked_sentences = r.get_ranked_phrases()
     return raked_sentences
 
-def from_document_to_salient(document, embedder, config, tastes, ratio=0.3, word_count=None, split=True):
+def split_sentences(text):
+    """
+    Sentence segmentation used by TextRank, shared with the fast readability backend
+    @param text: normalized text of a document
+
+    @return list of gensim SyntacticUnit (text: original sentence, token: preprocessed sentence)
+    """
+    return clean_text_by_sentences(text)
+
+def text_rank(units, ratio=0.3, word_count=None, split=True):
+    """
+    gensim summarize() working on sentences already segmented by split_sentences
+    """
+    if len(units) == 0:
+        return [] if split else ''
+    if len(units) == 1:
+        raise ValueError("input must have more than one sentence")
+    corpus = _build_corpus(units)
+    most_important_docs = summarize_corpus(corpus, ratio=ratio if word_count is None else 1)
+    if not most_important_docs:
+        return [] if split else ''
+    extracted_sentences = _extract_important_sentences(units, corpus, most_important_docs, word_count)
+    # Sorts the extracted sentences by apparition order in the original text.
+    extracted_sentences.sort(key=lambda s: s.index)
+    return _format_results(extracted_sentences, split)
+
+def extract_salient_sentences(text, ratio=0.3, word_count=None, split=True, units=None):
+    """
+    TextRank salient sentences of a text, without repeated words, duplicates and too short sentences
+    @param text: normalized text of a document
+    @param units: result of split_sentences(text), computed if None
+
+    @return list of strings
+    """
     #https://radimrehurek.com/gensim/summarization/summariser.html
     try:
-        summarized_sentences = summarize(document.normalized_text, ratio=ratio, word_count=word_count, split=split)
+        if units is None:
+            units = split_sentences(text)
+        summarized_sentences = text_rank(units, ratio=ratio, word_count=word_count, split=split)
     except:
         summarized_sentences = []
         print("Error, we were not able to find the salient sentence from the document!")
@@ -32,42 +68,192 @@ def from_document_to_salient(document, embedder, config, tastes, ratio=0.3, word
     # eliminate duplicates
     summarized_sentences = list(dict.fromkeys(summarized_sentences))
     summarized_sentences = [s for s in summarized_sentences if len(s) > 20]#delete too short sentences
-    return [SalientSentence(s, document.keywords, tastes, document.readability_score, document.score, embedder, 
-                config, document_uid=document.uid, position_in_document=index) for index, s in enumerate(summarized_sentences)]
+    return summarized_sentences
+
+def embed_salient_sentences(sentences, embedder, stopwords=[]):
+    """
+    Embeddings of the RAKE phrases of each sentence
+    @param sentences: list of strings
+    @param embedder: SisterEmbedder
+
+    @return float32 matrix with one row per sentence (zeros when nothing could be embedded)
+    """
+    return embedder.embed_batch([''.join(rake(s, stopwords)) for s in sentences])
+
+def to_matrix(vectors, dim=None):
+    """
+    Stack embeddings into a float32 matrix, replacing with zeros the ones that could not be computed
+    (e.g. the nan returned for a sentence without tokens)
+    @param vectors: list of arrays
+    @param dim: size of the rows, the largest vector size if None
+    """
+    if dim is None:
+        dim = max([np.size(v) for v in vectors], default=0)
+    matrix = np.zeros((len(vectors), dim), dtype=np.float32)
+    for i, v in enumerate(vectors):
+        if np.size(v) == dim:
+            matrix[i] = np.ravel(v)
+    return matrix
+
+class SalientScores():
+    """
+    Scores of all the salient sentences of a request, computed in a single numpy pass:
+        * sentences: list of strings
+        * embeddings: float32 matrix of the sentences' embeddings (sentences x dim)
+        * keywords: keywords and tastes, columns of the matrices below
+        * keyword_embeddings: float32 matrix of the keywords' embeddings (keywords x dim)
+        * mask: True where the keyword is one of the keywords of the sentence's document
+        * affinity: cosine similarity between sentences and keywords
+        * readibility, IR_score: scores of the sentence's document
+        * score: final score of each sentence w.r.t. each keyword
+    """
+    def __init__(self, documents, embedder, tastes, config, keyword_embeddings={}):
+        """
+        @param documents: list of analysed DocumentModel (see DocumentsAdaptation.analyse_documents)
+        @param embedder: SisterEmbedder
+        @param tastes: user's tastes, used for documents without keywords
+        @param config: weights of the final score
+        @param keyword_embeddings: embeddings already available (e.g. user.tastes_embedded)
+        """
+        self.sentences = []
+        self.document_uid = []
+        self.position_in_document = []
+        self.keywords = []
+        columns = {}
+        rows_keywords = []
+        readibility = []
+        IR_score = []
+        embeddings = []
+        for document in documents:
+            n = len(document.summarized_sentences)
+            if n == 0:
+                continue
+            keyword = document.keywords or tastes
+            for k in keyword:
+                if k not in columns:
+                    columns[k] = len(self.keywords)
+                    self.keywords.append(k)
+            rows_keywords += [[columns[k] for k in keyword]] * n
+            self.sentences += document.summarized_sentences
+            self.document_uid += [document.uid] * n
+            self.position_in_document += range(n)
+            readibility += [document.readability_score] * n
+            IR_score += [document.score] * n
+            embeddings.append(document.sentence_embeddings)
+
+        self.columns = columns
+        self.readibility = np.array(readibility, dtype=np.float32)
+        self.IR_score = np.array(IR_score, dtype=np.float32)
+        dim = max([e.shape[1] for e in embeddings], default=0)
+        self.embeddings = np.concatenate([e if e.shape[1] == dim else np.zeros((len(e), dim), dtype=np.float32)
+                                          for e in embeddings]) if embeddings else np.zeros((0, 0), dtype=np.float32)
+        missing = [k for k in self.keywords if k not in keyword_embeddings]
+        missing = dict(zip(missing, embedder.embed_batch(missing))) if missing else {}
+        self.keyword_embeddings = to_matrix([
+            keyword_embeddings[k] if k in keyword_embeddings else missing[k]
+            for k in self.keywords], dim=dim)
+        self.mask = np.zeros((len(self.sentences), len(self.keywords)), dtype=bool)
+        for row, cols in enumerate(rows_keywords):
+            self.mask[row, cols] = True
+
+        self.affinity = self.cosine_similarity(self.embeddings, self.keyword_embeddings)
+        self.weigh(config)
+
+    @staticmethod
+    def cosine_similarity(a, b):
+        """ Cosine similarity between the rows of a and b, 0 for zero vectors """
+        if a.size == 0 or b.size == 0:
+            return np.zeros((len(a), len(b)), dtype=np.float32)
+        a_norm = np.linalg.norm(a, axis=1, keepdims=True)
+        b_norm = np.linalg.norm(b, axis=1, keepdims=True)
+        a = np.divide(a, a_norm, out=np.zeros_like(a), where=a_norm > 0)
+        b = np.divide(b, b_norm, out=np.zeros_like(b), where=b_norm > 0)
+        return a @ b.T
+
+    def weigh(self, config):
+        """
+        Compute the final scores with the weights in config
+        @param config: object with expertise_weight, IR_score_weight and affinity_weight
+        """
+        partial_score = config.expertise_weight*self.readibility + config.IR_score_weight*self.IR_score
+        self.score = config.affinity_weight*self.affinity + partial_score[:, None]
+        return self.score
+
+    def salient_sentences(self):
+        """ @return list of SalientSentence, one view for each row """
+        return [SalientSentence(self, index) for index in range(len(self.sentences))]
 
 class SalientSentence():
-    def __init__(self, sentence, keyword, tastes, readibility, IR_score,  embedder, config, stopwords = [], document_uid=None, position_in_document=None):
-        self.sentence = sentence
-        self.readibility = readibility
-        self.sentence_rake_embed = self.sentence_rake_embed(stopwords, embedder)
-        if not keyword:
-            keyword = tastes
-        if keyword:
-            self.keyword = {k: embedder.embed(k) for k in keyword}
-            self.distance_keyword = {k: 1-distance.cosine(self.keyword[k], self.sentence_embedding) for k in keyword}
-            # the final score of the sentence associated to each keyword    
-            partial_score = config.expertise_weight*readibility + config.IR_score_weight*IR_score    
-            self.score = {k: config.affinity_weight*self.distance_keyword[k]+partial_score for k in keyword}
-        self.IR_score = IR_score
+    """
+    View over a row of SalientScores
+    """
+    def __init__(self, scores, index):
+        self.scores = scores
+        self.index = index
+        self.sentence = scores.sentences[index]
+        self.document_uid = scores.document_uid[index]
+        self.position_in_document = scores.position_in_document[index]
         # this variable willl be usefull for the policy
         self.assigned = False
-        self.document_uid = document_uid
-        self.position_in_document = position_in_document
-        
-    def sentence_rake_embed(self, stopwords, embedder):
-        # rake
-        # embedding
-        sentence = rake(self.sentence, stopwords)
-        #self.sentence_embeddings = np.concatenate([embedder.embed(s) for s in sentence])
-        self.sentence_embedding = embedder.embed(''.join(sentence))
-        
+
+    @property
+    def sentence_embedding(self):
+        return self.scores.embeddings[self.index]
+
+    @property
+    def readibility(self):
+        return float(self.scores.readibility[self.index])
+
+    @property
+    def IR_score(self):
+        return float(self.scores.IR_score[self.index])
+
+    def keyword_columns(self):
+        return [(k, j) for k, j in self.scores.columns.items() if self.scores.mask[self.index, j]]
+
+    @property
+    def keyword(self):
+        """ embedding of each keyword of the sentence """
+        return {k: self.scores.keyword_embeddings[j] for k, j in self.keyword_columns()}
+
+    @property
+    def distance_keyword(self):
+        """ cosine similarity w.r.t. each keyword of the sentence """
+        return {k: float(self.scores.affinity[self.index, j]) for k, j in self.keyword_columns()}
+
+    @property
+    def score(self):
+        """ final score of the sentence associated to each keyword """
+        return {k: float(self.scores.score[self.index, j]) for k, j in self.keyword_columns()}
 
 class SisterEmbedder:
-    def __init__(self, lang, tokenizer=None):
+    def __init__(self, lang, tokenizer=None, vectors_path=None):
+        """
+        @param lang: language of the fastText vectors
+        @param tokenizer: sister tokenizer, SimpleTokenizer if None
+        @param vectors_path: directory of a memory-mapped store written by export_vectors.py,
+            the fastText .bin model is loaded if None
+        """
         if tokenizer is None:
             tokenizer = SimpleTokenizer()
-        self.embedder = sister.MeanEmbedding(lang=lang, tokenizer=tokenizer)
+        word_embedder = MmapEmbedding(vectors_path) if vectors_path else None
+        self.embedder = sister.MeanEmbedding(lang=lang, tokenizer=tokenizer, word_embedder=word_embedder)
 
     def embed(self, sentence):
         return self.embedder(sentence)
 
+    def embed_batch(self, sentences):
+        """
+        @param sentences: list of strings
+        @return float32 matrix with one row per sentence, zeros for sentences without tokens
+        """
+        return self.embedder.embed_batch(sentences)
+
+    def vocabulary(self):
+        """ @return words of the fastText model and their counts, most frequent first """
+        return self.embedder.word_embedder.get_vocabulary()
+
+    def word_vectors(self, words):
+        """ @return float32 matrix with the vector of each word """
+        return self.embedder.word_embedder.get_word_vectors(words)
+
@@ -1,3 +1,5 @@
+from typing import List
+
 import numpy as np
 
 from sister.tokenizers import Tokenizer, SimpleTokenizer, JapaneseTokenizer
@@ -16,6 +18,9 @@ class SentenceEmbedding(object):
     def embed(self, sentence: str) -> np.ndarray:
         raise NotImplementedError
 
+    def embed_batch(self, sentences: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
     def __call__(self, sentence: str) -> np.ndarray:
         raise NotImplementedError
 
@@ -36,5 +41,31 @@ class MeanEmbedding(SentenceEmbedding):
         vectors = self.word_embedder.get_word_vectors(tokens)
         return np.mean(vectors, axis=0)
 
+    def embed_batch(self, sentences: List[str]) -> np.ndarray:
+        """Embed many sentences looking up each distinct token only once.
+
+        Sentences without tokens are embedded as zero vectors.
+        """
+        vocabulary = {}
+        token_ids = []
+        lengths = np.zeros(len(sentences), dtype=np.int64)
+        for i, sentence in enumerate(sentences):
+            tokens = self.tokenizer.tokenize(sentence)
+            lengths[i] = len(tokens)
+            token_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+
+        if not vocabulary:
+            return np.zeros((len(sentences), self.word_embedder.get_dimension()), dtype=np.float32)
+
+        vectors = self.word_embedder.get_word_vectors(list(vocabulary))
+        embeddings = np.zeros((len(sentences), vectors.shape[1]), dtype=np.float32)
+        # Segment sum of the token vectors of each sentence.
+        nonempty = lengths > 0
+        offsets = np.cumsum(lengths) - lengths
+        embeddings[nonempty] = np.add.reduceat(
+                vectors[np.array(token_ids)], offsets[nonempty], axis=0)
+        embeddings[nonempty] /= lengths[nonempty, None]
+        return embeddings
+
     def __call__(self, sentence: str) -> np.ndarray:
         return self.embed(sentence)
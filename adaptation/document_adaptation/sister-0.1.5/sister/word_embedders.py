@@ -1,5 +1,7 @@
-from typing import List
+from typing import List, Tuple, Union
 from pathlib import Path
+from functools import lru_cache
+import json
 
 from fasttext import load_model
 import numpy as np
@@ -36,6 +38,13 @@ class WordEmbedding(object):
     def get_word_vectors(self, words: List[str]) -> np.ndarray:
         raise NotImplementedError
 
+    def get_dimension(self) -> int:
+        raise NotImplementedError
+
+    def get_vocabulary(self) -> Tuple[List[str], List[int]]:
+        """Words of the model and their counts, most frequent first."""
+        raise NotImplementedError
+
 
 class FasttextEmbedding(WordEmbedding):
 
@@ -47,7 +56,133 @@ class FasttextEmbedding(WordEmbedding):
         return self.model.get_word_vector(word)
 
     def get_word_vectors(self, words: List[str]) -> np.ndarray:
-        vectors = []
-        for word in words:
-            vectors.append(self.get_word_vector(word))
-        return np.array(vectors)
+        vectors = np.empty((len(words), self.get_dimension()), dtype=np.float32)
+        for i, word in enumerate(words):
+            vectors[i] = self.model.get_word_vector(word)
+        return vectors
+
+    def get_dimension(self) -> int:
+        return self.model.get_dimension()
+
+    def get_vocabulary(self) -> Tuple[List[str], List[int]]:
+        words, counts = self.model.get_words(include_freq=True)
+        return list(words), [int(c) for c in counts]
+
+
+
+def export_fasttext(model, path: Union[str, Path], dtype: str = 'float32') -> None:
+    """Export a fastText model to a memory-mappable store.
+
+    The store is a directory holding ``vectors.npy`` (the input matrix:
+    one row per vocabulary word followed by the subword n-gram buckets)
+    and ``index.json`` (vocabulary, word counts and the subword settings).
+    """
+    if model.is_quantized():
+        raise ValueError('Quantized fastText models can not be exported')
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    args = model.f.getArgs()
+    words, counts = model.get_words(include_freq=True)
+    matrix = model.get_input_matrix()
+    vectors = np.lib.format.open_memmap(
+            str(path / 'vectors.npy'), mode='w+', dtype=dtype, shape=matrix.shape)
+    chunk = 65536
+    for start in range(0, matrix.shape[0], chunk):
+        vectors[start:start + chunk] = matrix[start:start + chunk]
+    vectors.flush()
+    del vectors
+
+    index = {
+            'words': list(words),
+            'counts': [int(c) for c in counts],
+            'dim': int(matrix.shape[1]),
+            'minn': int(args.minn),
+            'maxn': int(args.maxn),
+            'bucket': int(args.bucket),
+            'dtype': dtype,
+            }
+    with open(str(path / 'index.json'), 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False)
+
+
+class MmapEmbedding(WordEmbedding):
+    """Word vectors read from a store written by ``export_fasttext``.
+
+    The matrix is memory-mapped, so processes using the same store share
+    one page-cached copy. Out-of-vocabulary words are embedded from their
+    subword n-grams exactly as fastText does.
+    """
+
+    EOS = '</s>'
+
+    def __init__(self, path: Union[str, Path], cache_size: int = 65536) -> None:
+        path = Path(path)
+        with open(str(path / 'index.json'), encoding='utf-8') as f:
+            index = json.load(f)
+        self.vectors = np.load(str(path / 'vectors.npy'), mmap_mode='r')
+        self.words = index['words']
+        self.counts = index['counts']
+        self.word2id = {word: i for i, word in enumerate(self.words)}
+        self.nwords = len(self.words)
+        self.dim = index['dim']
+        self.minn = index['minn']
+        self.maxn = index['maxn']
+        self.bucket = index['bucket']
+        self.subword_ids = lru_cache(maxsize=cache_size)(self._subword_ids)
+
+    @staticmethod
+    def hash(ngram: bytes) -> int:
+        # FNV-1a as in fastText, bytes are sign extended like a C++ int8_t.
+        h = 2166136261
+        for byte in ngram:
+            if byte >= 128:
+                byte |= 0xFFFFFF00
+            h = ((h ^ byte) * 16777619) & 0xFFFFFFFF
+        return h
+
+    def compute_subwords(self, word: str) -> List[int]:
+        token = ('<' + word + '>').encode('utf-8')
+        ids = []
+        for i in range(len(token)):
+            if (token[i] & 0xC0) == 0x80:
+                continue
+            j = i
+            n = 1
+            while j < len(token) and n <= self.maxn:
+                j += 1
+                while j < len(token) and (token[j] & 0xC0) == 0x80:
+                    j += 1
+                if n >= self.minn and not (n == 1 and (i == 0 or j == len(token))):
+                    ids.append(self.nwords + self.hash(token[i:j]) % self.bucket)
+                n += 1
+        return ids
+
+    def _subword_ids(self, word: str) -> List[int]:
+        ids = []
+        i = self.word2id.get(word)
+        if i is not None:
+            ids.append(i)
+            if word == self.EOS:
+                return ids
+        if self.maxn > 0:
+            ids += self.compute_subwords(word)
+        return ids
+
+    def get_word_vector(self, word: str) -> np.ndarray:
+        ids = self.subword_ids(word)
+        if not ids:
+            return np.zeros(self.dim, dtype=np.float32)
+        return self.vectors[ids].astype(np.float32).mean(axis=0)
+
+    def get_word_vectors(self, words: List[str]) -> np.ndarray:
+        vectors = np.empty((len(words), self.dim), dtype=np.float32)
+        for i, word in enumerate(words):
+            vectors[i] = self.get_word_vector(word)
+        return vectors
+
+    def get_dimension(self) -> int:
+        return self.dim
+
+    def get_vocabulary(self) -> Tuple[List[str], List[int]]:
+        return list(self.words), list(self.counts)
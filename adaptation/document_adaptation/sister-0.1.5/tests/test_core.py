@@ -1,5 +1,5 @@
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import numpy as np
 
@@ -24,6 +24,13 @@ class SentenceEmbeddingCase(TestCase):
         with self.assertRaises(NotImplementedError):
             Dummy(Tokenizer(), WordEmbedding()).embed(sentence)
 
+    def test_embed_batch_not_implemented(self):
+        class Dummy(SentenceEmbedding):
+            def embed(self, s): ...
+        sentences = ['I am a dog.']
+        with self.assertRaises(NotImplementedError):
+            Dummy(Tokenizer(), WordEmbedding()).embed_batch(sentences)
+
     def test_call_not_implemented(self):
         class Dummy(SentenceEmbedding):
             def embed(self, s): ...
@@ -53,3 +60,44 @@ class MeanEmbeddingCase(TestCase):
         sentence = "I am a dog."
         vector = self.sentence_embedding(sentence)
         self.assertEqual(vector.shape, (300,))
+
+
+class MeanEmbeddingBatchCase(TestCase):
+
+    def setUp(self):
+        self.vectors = {}
+
+        def get_word_vector(word):
+            if word not in self.vectors:
+                self.vectors[word] = np.random.rand(300).astype(np.float32)
+            return self.vectors[word]
+
+        embedding = Mock(spec=WordEmbedding)
+        embedding.get_word_vectors.side_effect = lambda words: np.array([get_word_vector(w) for w in words])
+        embedding.get_dimension.return_value = 300
+        self.word_embedder = embedding
+        self.sentence_embedding = MeanEmbedding(
+                tokenizer=SimpleTokenizer(),
+                word_embedder=embedding
+                )
+
+    def test_embed_batch(self):
+        sentences = ["I am a dog.", "I am a cat, not a dog.", "Dog."]
+        vectors = self.sentence_embedding.embed_batch(sentences)
+        self.assertEqual(vectors.shape, (3, 300))
+        self.assertEqual(vectors.dtype, np.float32)
+        for sentence, vector in zip(sentences, vectors):
+            np.testing.assert_allclose(vector, self.sentence_embedding(sentence), rtol=1e-5)
+
+    def test_embed_batch_looks_up_tokens_once(self):
+        self.sentence_embedding.embed_batch(["a dog", "a dog", "a cat"])
+        self.word_embedder.get_word_vectors.assert_called_once_with(['a', 'dog', 'cat'])
+
+    def test_embed_batch_empty_sentences(self):
+        vectors = self.sentence_embedding.embed_batch(["", "a dog", ""])
+        self.assertEqual(vectors.shape, (3, 300))
+        self.assertFalse(vectors[0].any())
+        self.assertFalse(vectors[2].any())
+        self.assertTrue(vectors[1].any())
+        vectors = self.sentence_embedding.embed_batch([""])
+        self.assertEqual(vectors.shape, (1, 300))
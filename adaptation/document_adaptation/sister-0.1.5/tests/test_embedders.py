@@ -1,6 +1,11 @@
+import os
+import shutil
+import tempfile
 from unittest import TestCase
 
-from sister.word_embedders import WordEmbedding, FasttextEmbedding
+import numpy as np
+
+from sister.word_embedders import WordEmbedding, FasttextEmbedding, MmapEmbedding, export_fasttext
 
 
 class WordEmbeddingCase(TestCase):
@@ -25,6 +30,12 @@ class WordEmbeddingCase(TestCase):
             words = self.words
             Dummy().get_word_vector(words)
 
+    def test_get_vocabulary_not_implemented(self):
+        class Dummy(WordEmbedding):
+            def get_word_vector(self, w): ...
+        with self.assertRaises(NotImplementedError):
+            Dummy().get_vocabulary()
+
 
 class FasttextEmbeddingCase(TestCase):
 
@@ -56,3 +67,56 @@ class FasttextEmbeddingCase(TestCase):
         vectors = self.embedding.get_word_vectors(words)
         self.assertTupleEqual(vectors.shape, (len(words), 300))
         # self.embedding.get_word_vectors.assert_called_once_with(words)
+
+
+class MmapEmbeddingCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        import fasttext
+        cls.tempdir = tempfile.mkdtemp()
+        corpus = os.path.join(cls.tempdir, 'corpus.txt')
+        with open(corpus, 'w', encoding='utf-8') as f:
+            for _ in range(20):
+                f.write('the cat sat on the mat and the dog ate the città\n')
+        cls.model = fasttext.train_unsupervised(
+                corpus, model='skipgram', dim=8, minCount=1, epoch=1,
+                minn=2, maxn=4, bucket=1000, thread=1, verbose=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tempdir, ignore_errors=True)
+
+    def setUp(self):
+        self.words = ['cat', 'città', 'dogs', 'élan', 'x', '</s>']
+
+    def test_get_word_vector(self):
+        path = os.path.join(self.tempdir, 'float32')
+        export_fasttext(self.model, path)
+        embedding = MmapEmbedding(path)
+        self.assertEqual(embedding.get_dimension(), 8)
+        for word in self.words:
+            np.testing.assert_allclose(
+                    embedding.get_word_vector(word),
+                    self.model.get_word_vector(word),
+                    rtol=1e-5, atol=1e-6)
+
+    def test_get_vocabulary(self):
+        path = os.path.join(self.tempdir, 'vocabulary')
+        export_fasttext(self.model, path)
+        words, counts = MmapEmbedding(path).get_vocabulary()
+        expected_words, expected_counts = self.model.get_words(include_freq=True)
+        self.assertListEqual(words, list(expected_words))
+        self.assertListEqual(counts, [int(c) for c in expected_counts])
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+    def test_get_word_vectors_float16(self):
+        path = os.path.join(self.tempdir, 'float16')
+        export_fasttext(self.model, path, dtype='float16')
+        embedding = MmapEmbedding(path)
+        vectors = embedding.get_word_vectors(self.words)
+        self.assertTupleEqual(vectors.shape, (len(self.words), 8))
+        self.assertEqual(vectors.dtype, np.float32)
+        for word, vector in zip(self.words, vectors):
+            np.testing.assert_allclose(
+                    vector, self.model.get_word_vector(word), rtol=1e-2, atol=1e-3)
@@ -9,9 +9,13 @@ import random
 import time
 
 import time
+import numpy as np
 import torch
 from summarizer import Summarizer
+from summarizer.cluster_features import ClusterFeatures
 from transformers import *
+from .encoders import TorchEncoder, OnnxEncoder
+from .quantization import load_quantized
 
 import nltk
 nltk.download('punkt')
@@ -28,42 +32,157 @@ def getSpacyLang(lang='en'):
     return language
 
 class ModelSummarizer():
-    def __init__(self, config, lang=None, custom_model=None, custom_tokenizer=None, tokenizer=None, verbose=None, **kwargs):
+    def __init__(self, config, lang=None, custom_model=None, custom_tokenizer=None, tokenizer=None, verbose=None, embedding_cache=None, quantize=None, **kwargs):
         self.config = config
         self.verbose = verbose
         self.language = getSpacyLang(lang)
+        self.embedding_cache = embedding_cache
+        # int8 Linear layers for CPU inference, see quantization.py
+        if quantize is None:
+            quantize = bool(config and config.summarizer_quantize)
+        self.quantize = quantize
         
         if not (custom_model and custom_tokenizer):
             custom_model, custom_tokenizer = self.get_pretrained_language(lang)
+        else:
+            self.model_name = type(custom_model).__name__
 
         self.model = Summarizer(language=self.language, custom_model=custom_model, custom_tokenizer=custom_tokenizer, **kwargs)
+        # same defaults of bert-extractive-summarizer
+        self.random_state = kwargs.get('random_state', 12345)
+        self.encoder = self.get_encoder(lang, custom_model, custom_tokenizer,
+                                        hidden=kwargs.get('hidden', -2),
+                                        reduce_option=kwargs.get('reduce_option', 'mean'),
+                                        batch_size=config.summarizer_batch_size if config else 16)
+        # embeddings depend on the model and on how its hidden states are reduced
+        self.encoder_name = '{}{}:{}:{}'.format(self.model_name, ':int8' if self.quantize else '',
+                                                self.encoder.hidden, self.encoder.reduce_option)
+
+    def get_encoder(self, lang, model, tokenizer, **kwargs):
+        """
+        Encoder of the sentences, with the backend configured for the language in config.summarizer_backend:
+        "onnx" runs the model with onnxruntime, "torch" (default and fallback) with PyTorch
+        """
+        backend = self.config.summarizer_backend.get(lang, 'torch') if self.config else 'torch'
+        if backend == 'onnx' and self.quantize:
+            print("ONNX backend not available for the quantized '{}' model, using torch".format(lang))
+        elif backend == 'onnx':
+            path = os.path.join(self.config.onnx_models_dir,
+                                '{}.{}.onnx'.format(self.model_name.replace('/', '_'), kwargs.get('hidden', -2)))
+            try:
+                return OnnxEncoder(model, tokenizer, path,
+                                   intra_op_threads=self.config.onnx_intra_op_threads,
+                                   inter_op_threads=self.config.onnx_inter_op_threads, **kwargs)
+            except Exception as e:
+                print("ONNX backend not available for '{}' ({}), using torch".format(lang, e))
+        return TorchEncoder(model, tokenizer, **kwargs)
 
     def get_pretrained_language(self, lang):
         if lang=='en':
-            custom_model = RobertaModel.from_pretrained('distilroberta-base', output_hidden_states=True)
-            custom_tokenizer = RobertaTokenizer.from_pretrained('distilroberta-base')
+            self.model_name = 'distilroberta-base'
+            model_class, tokenizer_class = RobertaModel, RobertaTokenizer
+        else:
+            self.model_name = 'distilbert-base-multilingual-cased'
+            model_class, tokenizer_class = DistilBertModel, DistilBertTokenizer
+        if self.quantize:
+            custom_model = load_quantized(model_class, self.model_name, self.config.quantized_models_dir)
         else:
-            custom_model = DistilBertModel.from_pretrained('distilbert-base-multilingual-cased', output_hidden_states=True)
-            custom_tokenizer = DistilBertTokenizer.from_pretrained('distilbert-base-multilingual-cased')
+            custom_model = model_class.from_pretrained(self.model_name, output_hidden_states=True)
+        custom_tokenizer = tokenizer_class.from_pretrained(self.model_name)
         return custom_model, custom_tokenizer
 
-    def inference(self, txts, num_sentences=[], ratio=0.5, **kwargs):
-        result = []
-        for idx, txt in enumerate(txts):
-            _ratio = ratio
-            # If txt is not empty
-            if len(txt) > 0:
-                # Adaptive scale ration based on the items in the cluster
-                if len(num_sentences)>=idx:
-                    weight = num_sentences[idx] / sum(num_sentences)
-                    _ratio = min((self.config.max_sentences*weight) / num_sentences[idx], 0.8)
-                    if (self.verbose):
-                        print("Wehight-ratio on keyword: {}, {}".format(weight, _ratio))
-                pred = self.model(txt, ratio=_ratio, min_length=40, **kwargs)
+    def split_sentences(self, body, min_length=40, max_length=600):
+        """ Sentences of a text, as segmented by bert-extractive-summarizer """
+        if hasattr(self.model, 'sentence_handler'):
+            return self.model.sentence_handler(body, min_length, max_length)
+        return self.model.process_content_sentences(body, min_length, max_length)
+
+    def cluster_ratios(self, num_sentences, ratio=0.5):
+        """ Adaptive scale ratio of each cluster based on the items in the cluster """
+        ratios = []
+        for idx in range(len(num_sentences)):
+            weight = num_sentences[idx] / sum(num_sentences)
+            _ratio = min((self.config.max_sentences*weight) / num_sentences[idx], 0.8)
+            if (self.verbose):
+                print("Wehight-ratio on keyword: {}, {}".format(weight, _ratio))
+            ratios.append(_ratio)
+        return ratios
+
+    def encode(self, sentences):
+        """
+        Embeddings of the sentences, running the encoder only on the ones missing from the cache
+        @param sentences: list of strings
+
+        @return float32 matrix
+        """
+        if self.embedding_cache is None:
+            return self.encoder.encode(sentences)
+        embeddings = self.embedding_cache.get_many(self.encoder_name, sentences)
+        missing = [i for i, e in enumerate(embeddings) if e is None]
+        if missing:
+            computed = self.encoder.encode([sentences[i] for i in missing])
+            self.embedding_cache.put_many(self.encoder_name, [sentences[i] for i in missing], computed)
+            for i, embedding in zip(missing, computed):
+                embeddings[i] = embedding
+        if self.verbose:
+            print("Sentence embeddings: {} cached, {} encoded".format(len(sentences) - len(missing), len(missing)))
+        if not embeddings:
+            return np.zeros((0, 0), dtype=np.float32)
+        return np.array(embeddings, dtype=np.float32)
+
+    def select(self, content, embeddings, ratio, algorithm='kmeans', use_first=True):
+        """
+        Pick the sentences closest to the centroids of the clusters of their embeddings
+        @param content: list of sentences
+        @param embeddings: matrix with the embedding of each sentence
+
+        @return summary
+        """
+        args = ClusterFeatures(embeddings, algorithm, random_state=self.random_state).cluster(ratio)
+        if use_first and args[0] != 0:
+            args.insert(0, 0)
+        return ' '.join(content[j] for j in args)
+
+    def inference(self, txts, num_sentences=[], ratio=0.5, min_length=40, max_length=600, **kwargs):
+        """
+        Summarize each cluster of sentences (see iter_inference)
+        @param txts: list of texts, one per cluster
+        @param num_sentences: number of sentences of each cluster, used to scale the ratio
+
+        @return list of summaries
+        """
+        return list(self.iter_inference(txts, num_sentences, ratio, min_length, max_length, **kwargs))
+
+    def iter_inference(self, txts, num_sentences=[], ratio=0.5, min_length=40, max_length=600, **kwargs):
+        """
+        Summarize each cluster of sentences, yielding the summaries in order as soon as they are ready.
+        The sentences of the first cluster are encoded on their own, so that its summary is not delayed
+        by the others; the sentences of the remaining clusters are encoded together, in padded batches.
+        @param txts: list of texts, one per cluster
+        @param num_sentences: number of sentences of each cluster, used to scale the ratio
+
+        @return generator of summaries
+        """
+        ratios = [ratio] * len(txts)
+        if num_sentences and len(num_sentences) >= len(txts):
+            ratios = self.cluster_ratios(num_sentences[:len(txts)], ratio)
+        contents = [self.split_sentences(txt, min_length, max_length) if len(txt) > 0 else [] for txt in txts]
+
+        index = {}
+        embeddings = None
+        for i, (content, _ratio) in enumerate(zip(contents, ratios)):
+            if i <= 1:
+                # first cluster, then all the others at once
+                sentences = list(dict.fromkeys(s for c in (contents[:1] if i == 0 else contents[1:]) for s in c))
+                sentences = [s for s in sentences if s not in index]
+                if sentences:
+                    encoded = self.encode(sentences)
+                    index.update((s, j) for j, s in enumerate(sentences, len(index)))
+                    embeddings = encoded if embeddings is None else np.concatenate([embeddings, encoded])
+            if content:
+                yield self.select(content, embeddings[[index[s] for s in content]], _ratio, **kwargs)
             else:
-                pred = ''
-            result.append(''.join(pred))
-        return result
+                yield ''
 
     def to_batch(self, clusters, aggregate_from_same_doc=True):
         if (aggregate_from_same_doc):
@@ -85,31 +204,24 @@ class ModelSummarizer():
         return batch_sentences, num_sentences, keywords
 
     def aggregate_from_same_doc(self, clusters):
-        # Flatting clusters O(n)
-        flat_clusters = []
-        keywords = []
-        for keyword in clusters:
-            keywords.append(keyword)
-            flat_clusters += [(keyword, x) for x in clusters[keyword]]
-        # ~O(n^2)
-        new_flat_clusters = []
-        for couple in flat_clusters:
-            keyword, target = couple
-            # check in element is already in new_flat_clusters
-            if any((x[1].document_uid == target.document_uid and x[1].position_in_document == target.position_in_document) for x in new_flat_clusters):
-                continue
-            else:
-                from_same_doc = [x for x in flat_clusters if x[1].document_uid == target.document_uid]
-                from_same_doc.sort(key=lambda x: x[1].position_in_document)
-                new_flat_clusters += from_same_doc
-        # refactoring cluster O(n)
-        new_clusters = {}
-        for key in keywords:
-            new_clusters[key] = []
-        for couple in new_flat_clusters:
-            keyword, target = couple
-            new_clusters[keyword].append(target)
+        """
+        Reorder the sentences so that the ones coming from the same document are consecutive and in
+        the order of the document. Documents follow the order of their first sentence in clusters.
+        @param clusters: dictionary keyword -> list of SalientSentence
 
+        @return dictionary keyword -> list of SalientSentence
+        """
+        # group by document in one pass O(n)
+        documents = {}
+        for keyword in clusters:
+            for target in clusters[keyword]:
+                documents.setdefault(target.document_uid, []).append((keyword, target))
+        # order each document by position O(n log n), then refactor clusters O(n)
+        new_clusters = {keyword: [] for keyword in clusters}
+        for from_same_doc in documents.values():
+            from_same_doc.sort(key=lambda x: x[1].position_in_document)
+            for keyword, target in from_same_doc:
+                new_clusters[keyword].append(target)
         return new_clusters
 
          
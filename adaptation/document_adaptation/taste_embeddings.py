@@ -0,0 +1,74 @@
+"""
+    taste_embeddings.py: process-wide cache of the embeddings of the users' tastes, per language,
+        shared as read-only arrays by all the User objects
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import threading
+import numpy as np
+
+
+class TasteEmbeddings():
+    """
+    Embedding of each taste of each language, computed once.
+    The arrays are read-only, since every user with the same taste references the same array.
+    """
+    def __init__(self, max_entries=10000):
+        """
+        @param max_entries: maximum number of cached tastes of a language, the others are embedded on every request
+        """
+        self.max_entries = max_entries
+        self.embeddings = {}  # language -> {taste: array}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def read_only(embedding):
+        embedding = np.asarray(embedding)
+        embedding.setflags(write=False)
+        return embedding
+
+    def precompute(self, lang, tastes, embedder):
+        """
+        Embed the known tastes of a language, e.g. at startup
+        @param lang: language abbreviation (e.g. "en")
+        @param tastes: list of strings
+        @param embedder: SisterEmbedder of the language
+        """
+        with self.lock:
+            missing = [t for t in dict.fromkeys(tastes) if t not in self.embeddings.get(lang, {})]
+        embedded = {t: self.read_only(embedder.embed(t)) for t in missing}
+        with self.lock:
+            self.embeddings.setdefault(lang, {}).update(embedded)
+
+    def get(self, lang, taste, embedder):
+        """
+        @param lang: language abbreviation (e.g. "en")
+        @param taste: string
+        @param embedder: SisterEmbedder of the language, used on a miss
+
+        @return read-only embedding of the taste
+        """
+        with self.lock:
+            cached = self.embeddings.get(lang, {})
+            embedding = cached.get(taste)
+            if embedding is not None:
+                self.hits += 1
+                return embedding
+            self.misses += 1
+        embedding = self.read_only(embedder.embed(taste))
+        with self.lock:
+            cached = self.embeddings.setdefault(lang, {})
+            if len(cached) < self.max_entries:
+                embedding = cached.setdefault(taste, embedding)
+        return embedding
+
+    def stats(self):
+        with self.lock:
+            return {'tastes': {lang: len(e) for lang, e in self.embeddings.items()},
+                    'hits': self.hits, 'misses': self.misses}
@@ -12,35 +12,108 @@
 import random
 import json
 import os
+import re
+import threading
+import time
+
+FILE_RE = re.compile(r'^transitions_(\w+)\.json$')
 
 class transitions_handler(object):
-    def __init__(self, data_path):
+    """
+    Transitions of every language, loaded once from the transitions_<lang>.json files of data_path.
+    The files are checked for changes at most every reload_interval seconds and reloaded when modified,
+    so transitions can be edited without restarting the service.
+    """
+    def __init__(self, data_path, reload_interval=5):
+        """
+        @param data_path: directory with the transitions_<lang>.json files
+        @param reload_interval: seconds between checks of the files, None to never reload
+        """
         self.data_path = data_path
-        pass
+        self.reload_interval = reload_interval
+        self.tables = {}  # lang -> table (see load_table)
+        self.mtimes = {}  # lang -> mtime of the loaded file
+        self.last_check = 0
+        self.lock = threading.Lock()
+        self.reload()
+
+    @staticmethod
+    def load_table(path):
+        """
+        Load a transitions file, splitting the templates on their parameters
+        @return dictionary with:
+            * man: topic -> list of transitions
+            * zero_par, one_par, two_par: list of templates, each one as the list of its parts between parameters
+        """
+        with open(path) as json_file:
+            data = json.load(json_file)
+        table = {'man': data.get('man', {})}
+        for key in ['zero_par', 'one_par', 'two_par']:
+            table[key] = [x.split('{}') for x in data.get('auto', {}).get(key, [])]
+        return table
+
+    def reload(self):
+        """ Load new and modified transitions files, drop the ones that have been removed """
+        files = {}
+        for filename in os.listdir(self.data_path):
+            match = FILE_RE.match(filename)
+            if match:
+                files[match.group(1)] = os.path.join(self.data_path, filename)
+        tables = dict(self.tables)
+        mtimes = dict(self.mtimes)
+        for lang in set(tables) - set(files):
+            del tables[lang], mtimes[lang]
+        for lang, path in files.items():
+            mtime = os.stat(path).st_mtime
+            if mtimes.get(lang) == mtime:
+                continue
+            try:
+                tables[lang] = self.load_table(path)
+                mtimes[lang] = mtime
+            except (OSError, ValueError) as e:
+                # keep the previous version while the file is being edited
+                print("Could not load transitions {}: {}".format(path, e))
+        self.tables, self.mtimes = tables, mtimes
+        self.last_check = time.time()
+
+    def check_reload(self):
+        if self.reload_interval is None or time.time() - self.last_check < self.reload_interval:
+            return
+        with self.lock:
+            if time.time() - self.last_check >= self.reload_interval:
+                self.reload()
+
+    def languages(self):
+        self.check_reload()
+        return list(self.tables)
 
     def extract_transition(self, lang="eng", topic=None, t1=None, t2=None):
         """
         Assumption: if t1 is None also t2 is None
         """
-        if (lang != "en") and (lang != "it"):
+        self.check_reload()
+        data = self.tables.get(lang)
+        if data is None:
             raise Exception("LangNotImplementedException")
-        with open(os.path.join(self.data_path, "transitions_" + lang + ".json")) as json_file:
-            data = json.load(json_file)
-            transitions = None
-            if topic and topic in data["man"]:
-                transitions = data["man"][topic]
-            else:
-                if topic and topic not in data["man"]:
-                    t1 = topic
-
-                if not t1:  #No parameters
-                    transitions = data["auto"]["zero_par"]
-                else:
-                    if not t2:
-                        transitions = [x.format(t1) for x in data["auto"]["one_par"]]
-                    else:
-                        transitions = [x.format(t1, t2) for x in data["auto"]["two_par"]]
-            
+        if topic and topic in data["man"]:
+            transitions = data["man"][topic]
             if not transitions:
                 raise Exception("WrongTasteException")
             return random.choice(transitions)
+
+        if topic:
+            t1 = topic
+        if not t1:  #No parameters
+            templates, parameters = data["zero_par"], []
+        elif not t2:
+            templates, parameters = data["one_par"], [t1]
+        else:
+            templates, parameters = data["two_par"], [t1, t2]
+        if not templates:
+            raise Exception("WrongTasteException")
+
+        parts = random.choice(templates)
+        transition = parts[0]
+        for parameter, part in zip(parameters, parts[1:]):
+            transition += parameter + part
+        return transition
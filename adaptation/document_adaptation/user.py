@@ -33,12 +33,16 @@ class User():
         if 'language' in user_profile:
             self.language = user_profile['language']
 
-    def embed_tastes(self, embedder):
+    def embed_tastes(self, embedder, cache=None):
         """
         Function for assigning "tastes_embedded" field in User class
         @param embedder: object for mapping words into embeddings
+        @param cache: TasteEmbeddings shared by all the users, the embeddings are read-only arrays
         """
         if self.tastes:
             for taste in self.tastes:
-                self.tastes_embedded[taste] = embedder.embed(taste)
+                if cache is not None:
+                    self.tastes_embedded[taste] = cache.get(self.language, taste, embedder)
+                else:
+                    self.tastes_embedded[taste] = embedder.embed(taste)
         print("User's keywords", self.tastes)
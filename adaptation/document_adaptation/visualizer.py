@@ -6,6 +6,10 @@
     We declare that the content of this file is entirelly
     developed by the authors
 """
+import atexit
+import queue
+import random
+import threading
 import numpy as np
 from torch.utils.tensorboard import SummaryWriter
 from datetime import datetime
@@ -13,26 +17,100 @@ from config import config
 
 class _Visualizer():
     """
-    Class that define utility functions to use TensorBoard as visualization debug platform
+    Class that define utility functions to use TensorBoard as visualization debug platform.
+    Only a sample of the requests is exported (sample_rate) and the records are written by a background
+    thread: when its bounded queue is full new records are dropped, so requests never wait for TensorBoard.
     """
-    def __init__(self, log_dir="./visualizer_logs", flush_secs=120, filename_suffix='adaptation_'):
+    def __init__(self, log_dir="./visualizer_logs", flush_secs=120, filename_suffix='adaptation_',
+                 sample_rate=0.0, queue_size=8):
+        """
+        @param sample_rate: fraction of the requests exported, 0 disables the visualizer
+        @param queue_size: maximum number of records waiting to be written
+        """
         self.timestamp = datetime.now()
-        self.writer = SummaryWriter(log_dir = log_dir, flush_secs=flush_secs, filename_suffix=filename_suffix, comment=str(self.timestamp))
+        self.log_dir = log_dir
+        self.flush_secs = flush_secs
+        self.filename_suffix = filename_suffix
+        self.sample_rate = sample_rate
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.writer = None
+        self.thread = None
+        self.lock = threading.Lock()
+        # counters updated by the writer thread (written) and by the request threads (dropped)
+        self.counters_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+
+    def sampled(self):
+        """ @return True if the current request should be exported """
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def start(self):
+        """ Start the writer thread on first use """
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='visualizer', daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            record = self.queue.get()
+            if record is None:
+                break
+            vectors, metadata, metadata_header, tag = record
+            if self.writer is None:
+                self.writer = SummaryWriter(log_dir=self.log_dir, flush_secs=self.flush_secs,
+                                            filename_suffix=self.filename_suffix, comment=str(self.timestamp))
+            try:
+                self.writer.add_embedding(np.array(vectors), metadata, metadata_header=metadata_header, global_step=tag)
+                with self.counters_lock:
+                    self.written += 1
+            except Exception as e:
+                print("Visualizer could not write {}: {}".format(tag, e))
 
     def add_embedding(self, vectors, metadata, metadata_header, tag=None):
         """
-        Append given embeddings and informations to SummaryWriter
+        Queue given embeddings and informations for the SummaryWriter, dropping them if the queue is full
         @param vectors: list of embeddings' matrix
         @param metadata: list of records that describe the correspondent vector
         @param metadata_header: header of metadata columns
-        @return None
+        @return True if the record was queued
         """
         if not tag:
             tag = "main_"+str(datetime.now())
-        vectors = np.array(vectors)
-        self.writer.add_embedding(vectors, metadata, metadata_header=metadata_header, global_step=tag)
+        self.start()
+        try:
+            self.queue.put_nowait((vectors, metadata, metadata_header, tag))
+        except queue.Full:
+            with self.counters_lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def stats(self):
+        with self.counters_lock:
+            return {'written': self.written, 'dropped': self.dropped, 'queued': self.queue.qsize()}
 
-    def close(self):
-        self.writer.close()
+    def close(self, timeout=30):
+        """
+        Write the queued records and close the writer, called at exit (SIGTERM included, see main.py)
+        @param timeout: seconds to wait for the queued records
+        """
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            try:
+                self.queue.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            thread.join(timeout)
+            if thread.is_alive():
+                # still writing, closing the writer under it would corrupt the event file
+                print("Visualizer: {} records not written".format(self.queue.qsize()))
+                return
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
 
-Visualizer = _Visualizer()
\ No newline at end of file
+Visualizer = _Visualizer(sample_rate=config.visualizer_sample_rate, queue_size=config.visualizer_queue_size)
+atexit.register(Visualizer.close)
@@ -0,0 +1,30 @@
+"""
+    export_vectors.py: converts the fastText models of the configured languages into
+        memory-mapped word vectors stores, read by SisterEmbedder
+    Usage (from adaptation's folder): python export_vectors.py --dtype float16
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import argparse
+import os
+from sister.word_embedders import get_fasttext, export_fasttext
+from config import config
+
+parser = argparse.ArgumentParser(
+    description='Export fastText vocabulary and subword buckets to memory-mapped stores')
+parser.add_argument('--languages', nargs='+', default=config.languages,
+                    help='languages to export')
+parser.add_argument('--dtype', choices=['float32', 'float16'], default='float32',
+                    help='type of the stored vectors')
+parser.add_argument('--out', type=str, default=config.mmap_vectors_dir or 'cache/vectors',
+                    help='root directory of the stores, one sub-directory per language')
+args = parser.parse_args()
+
+for lang in args.languages:
+    path = os.path.join(args.out, lang)
+    print("Exporting '{}' vectors to {}...".format(lang, path))
+    export_fasttext(get_fasttext(lang), path, dtype=args.dtype)
@@ -11,14 +11,17 @@
 # Attirbuti JSON - camelCase
 
 import os
+import signal
 import sys
 import traceback
-from flask import Flask, jsonify, request, abort
+from contextlib import closing
+from flask import Flask, Response, jsonify, request, abort, stream_with_context
 import json
 from logging.handlers import RotatingFileHandler
 
-from document_adaptation import DocumentsAdaptation, User, Visualizer
+from document_adaptation import DocumentsAdaptation, User
 from config import config
+from response_cache import ResponseCache
 from urllib.parse import urlparse
 
 PORT = 6397
@@ -30,6 +33,7 @@ with open('../routes.json') as f:
 
 app = Flask(__name__, static_folder="documentation")
 document_adaptation = DocumentsAdaptation(config, max_workers=8, verbose=config.debug)
+response_cache = ResponseCache(config.response_cache_size, config.response_cache_ttl)
 
 @app.route('/', methods=["GET","POST"])
 def hello():
@@ -38,57 +42,120 @@ def hello():
         api_docs = f.read()
     return api_docs
 
+@app.route('/stats', methods=["GET"])
+def stats():
+    stats = document_adaptation.stats()
+    stats['response_cache'] = response_cache.stats()
+    return jsonify(stats)
+
+def request_error(req, needs_results=True, profile_fields=('tastes', 'expertiseLevel', 'language')):
+    """
+    Validation of the input of /keywords, /tailored_text and /tailored_text_stream
+    @param req: json of the request
+    @param needs_results: False if the request has no IR results (/keywords)
+    @param profile_fields: fields the userProfile must have
+
+    @return error response to send back, None if the request is valid
+    """
+    if not req:
+        return abort(400) # BAD REQUEST
+    if needs_results and 'results' not in req:
+        req['adaptionError'] = "results not found"
+    elif 'userProfile' not in req:
+        req['adaptionError'] = "userProfile not found"
+    elif any(field not in req['userProfile'] for field in profile_fields):
+        req['adaptionError'] = "userProfile incomplete"
+    else:
+        return None
+    return jsonify(req), 400
+
 @app.route('/keywords', methods=["POST"])
 def keywords(): 
     req = request.get_json()
-    req['keywordExpansion'] = []
-    
+
     # Errors
-    if not req:
-        return abort(400) # BAD REQUEST
-    if 'userProfile' not in req:
-        req['adaptionError'] = {"userProfile not found"}
-        return jsonify(req), 400
-    if 'tastes' not in req['userProfile']:
-        req['adaptionError'] = {"userProfile incomplete"}
-		
-	
+    error = request_error(req, needs_results=False, profile_fields=('tastes',))
+    if error:
+        return error
+    req['keywordExpansion'] = []
+
     # Body
     user = User(req["userProfile"])
-    results = document_adaptation.get_keywords(user.tastes)
+    results = document_adaptation.get_keywords(user.tastes, user.language)
     req['keywordExpansion'] = results 
     return jsonify(req)
 
 @app.route('/tailored_text', methods=["POST"])
 def tailored_text():
     req = request.get_json()
-    req['tailoredText'] = ''
 
     # Errors
-    if not req:
-        return abort(400) # BAD REQUEST
-    if  'results' not in req:
-        req['adaptionError'] = {"results not found"}
-        return jsonify(req), 400
-    if 'userProfile' not in req:
-        req['adaptionError'] = {"userProfile not found"}
-        return jsonify(req), 400
-    if 'tastes' not in req['userProfile'] or 'expertiseLevel' not in req['userProfile'] or 'language' not in req['userProfile']:
-        req['adaptionError'] = {"userProfile incomplete"}
-    
+    error = request_error(req)
+    if error:
+        return error
+    req['tailoredText'] = ''
+
     # Body
     user = User(req["userProfile"], expand=True)
     
     document_adaptation.language_assertion(user.language)
 
-    results = document_adaptation.get_tailored_text(req['results'], user)
+    # identical requests (same results and profile) are computed once
+    key = ResponseCache.fingerprint(req['results'], user)
+    results = response_cache.get_or_compute(
+        key, lambda: document_adaptation.get_tailored_text(req['results'], user))
     if not results:
         results = "Sorry,\nit is not art."
     req['tailoredText'] = results
-    
-    Visualizer.close()
     return jsonify(req)
 
+def sse(event, data):
+    """ Server-Sent Event with a json payload """
+    return "event: {}\ndata: {}\n\n".format(event, json.dumps(data))
+
+@app.route('/tailored_text_stream', methods=["POST"])
+def tailored_text_stream():
+    """
+    Same input of /tailored_text, the tailored text is sent as Server-Sent Events:
+        * paragraph: {"keyword", "text"} as soon as the summary of each keyword is ready
+          (a single paragraph with null keyword if the text is cached or computed by an identical request)
+        * end: {"tailoredText"} the whole text, as returned by /tailored_text
+        * error: {"adaptionError"} if the adaptation fails after the stream started
+    """
+    req = request.get_json()
+
+    # Errors
+    error = request_error(req)
+    if error:
+        return error
+
+    # Body
+    user = User(req["userProfile"], expand=True)
+
+    document_adaptation.language_assertion(user.language)
+
+    # identical requests (same results and profile) are computed once, as for /tailored_text
+    key = ResponseCache.fingerprint(req['results'], user)
+    def generate():
+        results = ''
+        try:
+            # closed with the stream, so a client going away releases the identical requests waiting for it
+            with closing(response_cache.iter_or_compute(
+                    key, lambda: document_adaptation.iter_tailored_text(req['results'], user))) as paragraphs:
+                for keyword, paragraph in paragraphs:
+                    results += paragraph
+                    yield sse('paragraph', {'keyword': keyword, 'text': paragraph})
+        except Exception:
+            yield sse('error', {'adaptionError': traceback.format_exc()})
+            return
+        if not results:
+            results = "Sorry,\nit is not art."
+        yield sse('end', {'tailoredText': results})
+
+    # no buffering by proxies, the first paragraph must reach the client immediately
+    headers = {'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers=headers)
+
 @app.errorhandler(500)
 def internal_error(exc):
     req = request.get_json()
@@ -96,7 +163,13 @@ def internal_error(exc):
     req['adaptionError'] = traceback.format_exc()
     return jsonify(req), 500
 
+def terminate(signum, frame):
+    # docker stop sends SIGTERM: exit normally, so that the atexit handlers save the caches
+    # and flush the visualizer
+    sys.exit(0)
+
 if __name__ == '__main__':
+    signal.signal(signal.SIGTERM, terminate)
     app.run(debug=config.debug, host= '0.0.0.0', port=PORT, use_reloader=False)
     
 
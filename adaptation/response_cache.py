@@ -0,0 +1,190 @@
+"""
+    response_cache.py: in-memory cache of the tailored texts, keyed by the fingerprint of the IR results
+        and of the user profile, with time to live, size bound and single-flight computation
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+class _Flight():
+    """ Computation in progress, the requests with the same key wait for it """
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _Interrupted(Exception):
+    """ Streamed computation closed before its end """
+
+
+class ResponseCache():
+    """
+    Least recently used cache of responses, each one valid for ttl seconds.
+    Concurrent requests with the same key wait for a single computation.
+    """
+    def __init__(self, max_entries=256, ttl=600):
+        """
+        @param max_entries: maximum number of cached responses, 0 disables the cache
+        @param ttl: seconds a response stays valid
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expiry time, value)
+        self.flights = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+
+    @staticmethod
+    def fingerprint(results, user):
+        """
+        Key of a request: hash of the IR results (url and content, in order) and of the normalized user profile
+        @param results: list of IR results
+        @param user: User of the request
+
+        @return hex digest
+        """
+        digest = hashlib.sha1()
+        profile = {'tastes': user.tastes, 'expertiseLevel': user.expertise_level, 'language': user.language.lower()}
+        digest.update(json.dumps(profile, sort_keys=True).encode('utf-8'))
+        for result in results:
+            content = hashlib.sha1(json.dumps(result, sort_keys=True).encode('utf-8')).hexdigest()
+            digest.update('|{}|{}'.format(result.get('url', ''), content).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """ @return cached response or None, the caller must hold the lock """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        expiry, value = entry
+        if expiry < time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """ Store a response, the caller must hold the lock """
+        self.entries[key] = (time.time() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def join(self, key):
+        """
+        Look up a response or join the computation in progress for its key
+        @return (cached response or None, flight, True if the caller must compute and finish the flight)
+        """
+        with self.lock:
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                return value, None, False
+            flight = self.flights.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self.flights[key] = _Flight()
+            else:
+                self.waits += 1
+            return None, flight, leader
+
+    def finish(self, key, flight):
+        """ Cache the value of a flight (unless it failed) and release the requests waiting for it """
+        with self.lock:
+            if flight.error is None and flight.value is not None:
+                self.put(key, flight.value)
+            del self.flights[key]
+        flight.done.set()
+
+    def get_or_compute(self, key, compute):
+        """
+        @param key: fingerprint of the request
+        @param compute: function without arguments returning the response
+
+        @return cached response, or the one computed by this request or by a concurrent one with the same key
+        """
+        if not self.max_entries:
+            return compute()
+        while True:
+            value, flight, leader = self.join(key)
+            if value is not None:
+                return value
+            if leader:
+                break
+            flight.done.wait()
+            if isinstance(flight.error, _Interrupted):
+                # waiting on a stream whose client went away, compute it here
+                continue
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self.finish(key, flight)
+        return flight.value
+
+    def iter_or_compute(self, key, iterate):
+        """
+        Streaming get_or_compute: the response is a sequence of (label, text) parts, cached as the concatenation
+        of the texts. The request computing it yields the parts as soon as they are ready, a cached response
+        or one computed by a concurrent request is yielded as the single part (None, response).
+        @param key: fingerprint of the request
+        @param iterate: function without arguments returning an iterator of (label, text)
+
+        @return generator of (label, text)
+        """
+        if not self.max_entries:
+            yield from iterate()
+            return
+        while True:
+            value, flight, leader = self.join(key)
+            if value is not None:
+                yield None, value
+                return
+            if leader:
+                break
+            flight.done.wait()
+            if isinstance(flight.error, _Interrupted):
+                # the client of the computing request went away, compute it here
+                continue
+            if flight.error is not None:
+                raise flight.error
+            yield None, flight.value
+            return
+
+        texts = []
+        try:
+            for label, text in iterate():
+                texts.append(text)
+                yield label, text
+            flight.value = ''.join(texts)
+        except GeneratorExit:
+            flight.error = _Interrupted()
+            raise
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self.finish(key, flight)
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.entries), 'hits': self.hits, 'misses': self.misses, 'waits': self.waits}
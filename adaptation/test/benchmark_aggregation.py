@@ -0,0 +1,90 @@
+"""
+    benchmark_aggregation.py: times ModelSummarizer.aggregate_from_same_doc against the previous
+        quadratic implementation on synthetic clusters, checking that both give the same clusters
+    Must be launched from root of adaptation's folder:
+        python test/benchmark_aggregation.py --sizes 1000,2000,5000,10000
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import sys
+sys.path.append('./')
+
+import argparse
+import random
+import time
+
+from document_adaptation.summarization import ModelSummarizer
+
+parser = argparse.ArgumentParser(
+    description='Scaling of the aggregation of the sentences coming from the same document')
+parser.add_argument('--sizes', type=str, default='1000,2000,5000,10000',
+                    help='comma separated numbers of sentences')
+parser.add_argument('--keywords', type=int, default=5,
+                    help='number of clusters')
+parser.add_argument('--sentences-per-document', type=int, default=20,
+                    help='average number of sentences of a document')
+parser.add_argument('--seed', type=int, default=0)
+args = parser.parse_args()
+
+
+class SyntheticSentence():
+    def __init__(self, document_uid, position_in_document):
+        self.document_uid = document_uid
+        self.position_in_document = position_in_document
+
+
+def synthetic_clusters(num_sentences, num_keywords, sentences_per_document, rng):
+    num_documents = max(1, num_sentences // sentences_per_document)
+    sentences = [SyntheticSentence(i % num_documents, i // num_documents) for i in range(num_sentences)]
+    rng.shuffle(sentences)
+    clusters = {'keyword_{}'.format(k): [] for k in range(num_keywords)}
+    keywords = list(clusters)
+    for sentence in sentences:
+        clusters[rng.choice(keywords)].append(sentence)
+    return clusters
+
+
+def quadratic_aggregate_from_same_doc(clusters):
+    """ Previous implementation, kept as reference """
+    flat_clusters = []
+    keywords = []
+    for keyword in clusters:
+        keywords.append(keyword)
+        flat_clusters += [(keyword, x) for x in clusters[keyword]]
+    new_flat_clusters = []
+    for couple in flat_clusters:
+        keyword, target = couple
+        if any((x[1].document_uid == target.document_uid and x[1].position_in_document == target.position_in_document) for x in new_flat_clusters):
+            continue
+        else:
+            from_same_doc = [x for x in flat_clusters if x[1].document_uid == target.document_uid]
+            from_same_doc.sort(key=lambda x: x[1].position_in_document)
+            new_flat_clusters += from_same_doc
+    new_clusters = {}
+    for key in keywords:
+        new_clusters[key] = []
+    for couple in new_flat_clusters:
+        keyword, target = couple
+        new_clusters[keyword].append(target)
+    return new_clusters
+
+
+rng = random.Random(args.seed)
+print("{:>10} {:>12} {:>12} {:>10} {:>6}".format('sentences', 'quadratic', 'indexed', 'speedup', 'same'))
+for size in [int(x) for x in args.sizes.split(',')]:
+    clusters = synthetic_clusters(size, args.keywords, args.sentences_per_document, rng)
+
+    start = time.perf_counter()
+    expected = quadratic_aggregate_from_same_doc(clusters)
+    quadratic = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = ModelSummarizer.aggregate_from_same_doc(None, clusters)
+    indexed = time.perf_counter() - start
+
+    same = all([id(x) for x in result[k]] == [id(x) for x in expected[k]] for k in clusters)
+    print("{:>10} {:>11.3f}s {:>11.4f}s {:>9.0f}x {:>6}".format(size, quadratic, indexed, quadratic / indexed, str(same)))
@@ -0,0 +1,79 @@
+"""
+    benchmark_policy.py: compares the greedy policy with the optimal assignment one
+        (config.policy_algorithm) on synthetic salient sentences, reporting total score,
+        number of assigned sentences and time
+    Must be launched from root of adaptation's folder:
+        python test/benchmark_policy.py --sentences 2000 --tastes 5 --cluster-size 40
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import sys
+sys.path.append('./')
+
+import argparse
+import time
+import numpy as np
+
+from document_adaptation.policy import Policy
+from document_adaptation.salient_sentences import SalientScores
+
+parser = argparse.ArgumentParser(
+    description='Quality and speed of the greedy and of the assignment policy')
+parser.add_argument('--sentences', type=int, default=2000,
+                    help='number of salient sentences')
+parser.add_argument('--tastes', type=int, default=5,
+                    help='number of user tastes')
+parser.add_argument('--cluster-size', type=int, default=40,
+                    help='max_cluster_size of the policy')
+parser.add_argument('--repeat', type=int, default=5,
+                    help='number of runs, the fastest is reported')
+parser.add_argument('--seed', type=int, default=0)
+args = parser.parse_args()
+
+
+class SyntheticUser():
+    def __init__(self, tastes):
+        self.tastes = tastes
+        self.tastes_embedded = {t: np.zeros((1, 4), dtype=np.float32) for t in tastes}
+
+
+def synthetic_scores(num_sentences, tastes, rng):
+    """ SalientScores with random scores, each sentence's document retrieved for 1-3 tastes """
+    scores = SalientScores.__new__(SalientScores)
+    scores.sentences = ['sentence {}'.format(i) for i in range(num_sentences)]
+    scores.document_uid = list(range(num_sentences))
+    scores.position_in_document = [0] * num_sentences
+    scores.keywords = list(tastes)
+    scores.columns = {t: j for j, t in enumerate(tastes)}
+    scores.embeddings = np.zeros((num_sentences, 4), dtype=np.float32)
+    scores.keyword_embeddings = np.zeros((len(tastes), 4), dtype=np.float32)
+    scores.readibility = rng.random(num_sentences).astype(np.float32)
+    scores.IR_score = rng.random(num_sentences).astype(np.float32)
+    scores.affinity = rng.random((num_sentences, len(tastes))).astype(np.float32)
+    scores.score = scores.affinity + scores.readibility[:, None] + scores.IR_score[:, None]
+    scores.mask = np.zeros((num_sentences, len(tastes)), dtype=bool)
+    for row in range(num_sentences):
+        scores.mask[row, rng.choice(len(tastes), rng.integers(1, 4), replace=False)] = True
+    return scores
+
+
+rng = np.random.default_rng(args.seed)
+tastes = ['taste_{}'.format(j) for j in range(args.tastes)]
+user = SyntheticUser(tastes)
+scores = synthetic_scores(args.sentences, tastes, rng)
+
+print("{:<12} {:>12} {:>10} {:>10}".format('algorithm', 'total score', 'assigned', 'time'))
+for algorithm, method in [('greedy', Policy.create_cluster_greedy), ('assignment', Policy.create_cluster_ILP)]:
+    elapsed = []
+    for _ in range(args.repeat):
+        policy = Policy(scores.salient_sentences(), user, args.cluster_size, algorithm=algorithm)
+        start = time.perf_counter()
+        method(policy)
+        elapsed.append(time.perf_counter() - start)
+    total = sum(s.scores.score[s.index, scores.columns[t]] for t in policy.results for s in policy.results[t])
+    assigned = sum(len(policy.results[t]) for t in policy.results)
+    print("{:<12} {:>12.2f} {:>10} {:>8.1f}ms".format(algorithm, total, assigned, min(elapsed) * 1000))
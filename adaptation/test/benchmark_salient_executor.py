@@ -0,0 +1,68 @@
+"""
+    benchmark_salient_executor.py: compares the thread pool and the process pool
+        used for the extraction of the salient sentences (config.salient_executor)
+    Must be launched from root of adaptation's folder:
+        python test/benchmark_salient_executor.py --workers 8 --repeat 3
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import sys
+sys.path.append('./')
+
+import argparse
+import glob
+import json
+import time
+from copy import deepcopy
+
+from document_adaptation import DocumentsAdaptation, User
+from document_adaptation.document_model import DocumentModel
+from config import config
+
+parser = argparse.ArgumentParser(
+    description='Time the salient sentences extraction with the thread and the process executor')
+parser.add_argument('--files', type=str, default='./data/ir_*.json',
+                    help='glob of the IR results to use')
+parser.add_argument('--workers', type=int, default=8,
+                    help='number of workers of both pools')
+parser.add_argument('--repeat', type=int, default=3,
+                    help='number of runs for each file')
+args = parser.parse_args()
+
+requests = []
+for path in sorted(glob.glob(args.files)):
+    with open(path) as f:
+        requests.append((path, json.load(f)))
+
+timings = {}
+for mode in ['thread', 'process']:
+    mode_config = deepcopy(config)
+    mode_config.salient_executor = mode
+    # the cache would hide the cost of the extraction
+    mode_config.document_cache_path = None
+    document_adaptation = DocumentsAdaptation(mode_config, max_workers=args.workers)
+
+    timings[mode] = {}
+    for path, req in requests:
+        user = User(req['userProfile'])
+        nlp = document_adaptation.get_nlp(user.language)
+        elapsed = []
+        for _ in range(args.repeat):
+            documents = [DocumentModel(x, user, nlp, uid=index) for index, x in enumerate(req['results'])]
+            documents = [d for d in documents if d.plain_text]
+            start = time.perf_counter()
+            document_adaptation.analyse_documents(documents, user.language)
+            elapsed.append(time.perf_counter() - start)
+        timings[mode][path] = min(elapsed)
+
+    if document_adaptation.process_pool:
+        document_adaptation.process_pool.shutdown()
+
+print("{:<45} {:>10} {:>10} {:>8}".format('file', 'thread', 'process', 'speedup'))
+for path, _ in requests:
+    thread, process = timings['thread'][path], timings['process'][path]
+    print("{:<45} {:>9.2f}s {:>9.2f}s {:>7.2f}x".format(path, thread, process, thread / process))
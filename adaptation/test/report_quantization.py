@@ -0,0 +1,84 @@
+"""
+    report_quantization.py: compares the int8 quantized summarizer (config.summarizer_quantize)
+        with the fp32 one on the sample IR results, reporting summary overlap and latency
+    Must be launched from root of adaptation's folder:
+        python test/report_quantization.py --language en --repeat 3
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import sys
+sys.path.append('./')
+
+import argparse
+import glob
+import json
+import time
+
+from document_adaptation.summarization import ModelSummarizer
+from document_adaptation.document_model import DocumentModel
+from document_adaptation import User
+from config import config
+
+parser = argparse.ArgumentParser(
+    description='Summary overlap and latency of the int8 quantized summarizer against the fp32 one')
+parser.add_argument('--files', type=str, default='./data/ir_*.json',
+                    help='glob of the IR results to use')
+parser.add_argument('--language', type=str, default='en',
+                    help='language of the summarizer')
+parser.add_argument('--ratio', type=float, default=0.3,
+                    help='ratio of the sentences kept in each summary')
+parser.add_argument('--repeat', type=int, default=3,
+                    help='number of runs for each file, the fastest is reported')
+args = parser.parse_args()
+
+texts = {}
+for path in sorted(glob.glob(args.files)):
+    with open(path) as f:
+        req = json.load(f)
+    user = User(req['userProfile'])
+    documents = [DocumentModel(x, user, None, uid=index) for index, x in enumerate(req['results'])]
+    texts[path] = [d.plain_text for d in documents if d.plain_text]
+
+# no embedding cache, so every run pays the encoder
+summarizers = {
+    'fp32': ModelSummarizer(config, lang=args.language, quantize=False),
+    'int8': ModelSummarizer(config, lang=args.language, quantize=True),
+}
+
+summaries = {}
+timings = {}
+for mode, summarizer in summarizers.items():
+    summaries[mode] = {}
+    timings[mode] = {}
+    for path, txts in texts.items():
+        elapsed = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            result = summarizer.inference(txts, ratio=args.ratio)
+            elapsed.append(time.perf_counter() - start)
+        summaries[mode][path] = result
+        timings[mode][path] = min(elapsed)
+
+
+def overlap(a, b):
+    """ Jaccard similarity of the sentences selected in two summaries """
+    a = set(summarizers['fp32'].split_sentences(a))
+    b = set(summarizers['fp32'].split_sentences(b))
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+print("{:<45} {:>9} {:>9} {:>8} {:>8}".format('file', 'fp32', 'int8', 'speedup', 'overlap'))
+total_overlap = []
+for path in texts:
+    fp32, int8 = timings['fp32'][path], timings['int8'][path]
+    scores = [overlap(a, b) for a, b in zip(summaries['fp32'][path], summaries['int8'][path])]
+    mean_overlap = sum(scores) / len(scores) if scores else 1.0
+    total_overlap.append(mean_overlap)
+    print("{:<45} {:>8.2f}s {:>8.2f}s {:>7.2f}x {:>8.3f}".format(path, fp32, int8, fp32 / int8, mean_overlap))
+print("Mean overlap: {:.3f}".format(sum(total_overlap) / len(total_overlap) if total_overlap else 1.0))
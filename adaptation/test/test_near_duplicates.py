@@ -0,0 +1,63 @@
+"""
+    test_near_duplicates.py: checks that near-duplicate sentences are merged only when they state the same facts
+    Must be launched from root of adaptation's folder:
+        python test/test_near_duplicates.py
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import sys
+sys.path.append('./')
+
+import json
+import unittest
+
+from document_adaptation import near_duplicates
+
+with open('./config.json') as f:
+    DISTANCE = json.load(f)['near_duplicate_sentence_distance']
+
+SENTENCE = "Leonardo da Vinci painted the Mona Lisa in Florence between 1503 and 1506."
+
+
+def unique_sentences(sentences):
+    """ @return the sentences kept by the sentence deduplication of DocumentsAdaptation """
+    return [sentences[i] for i in near_duplicates.unique(
+        sentences, DISTANCE, shingle_size=near_duplicates.SENTENCE_SHINGLE_SIZE,
+        confirm=near_duplicates.same_facts)]
+
+
+class NearDuplicateSentencesCase(unittest.TestCase):
+    def test_variants_merged(self):
+        variants = [
+            "Leonardo da Vinci painted the Mona Lisa in Florence between 1503 and 1506.[12]",
+            "Leonardo  da Vinci painted the  Mona Lisa in Florence between 1503 and 1506 [3].",
+            "LEONARDO DA VINCI painted the Mona Lisa in Florence between 1503 and 1506.",
+        ]
+        self.assertEqual(unique_sentences([SENTENCE] + variants), [SENTENCE])
+
+    def test_changed_number_kept(self):
+        changed = "Leonardo da Vinci painted the Mona Lisa in Florence between 1503 and 1519."
+        self.assertEqual(unique_sentences([SENTENCE, changed]), [SENTENCE, changed])
+
+    def test_negation_kept(self):
+        sentences = [
+            "The painting was stolen from the Louvre in 1911.",
+            "The painting was not stolen from the Louvre in 1911.",
+            "Il dipinto non fu rubato dal Louvre nel 1911.",
+            "Il dipinto fu rubato dal Louvre nel 1911.",
+        ]
+        self.assertEqual(unique_sentences(sentences), sentences)
+
+    def test_same_facts(self):
+        self.assertTrue(near_duplicates.same_facts(SENTENCE, SENTENCE + " [4]"))
+        self.assertTrue(near_duplicates.same_facts("It is a famous portrait.", "It is also a famous portrait."))
+        self.assertFalse(near_duplicates.same_facts("It is a famous portrait.", "It isn't a famous portrait."))
+        self.assertFalse(near_duplicates.same_facts("It was painted in 1503.", "It was painted in 1506."))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+    test_normalizer.py: checks that DocumentModel.get_plain_text and DocumentModel.normalize give the same
+        output as before on the documents in data/, comparing hashes with test/normalizer_golden.json
+    Must be launched from root of adaptation's folder:
+        python test/test_normalizer.py
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import sys
+sys.path.append('./')
+
+import hashlib
+import json
+import os
+import unittest
+
+from document_adaptation.document_model import DocumentModel
+
+GOLDEN_PATH = './test/normalizer_golden.json'
+
+
+def text_hashes(path):
+    """ @return sha1 of the plain texts and of the normalized texts of the results of an IR file """
+    with open(path) as f:
+        req = json.load(f)
+    plain_text = hashlib.sha1()
+    normalized_text = hashlib.sha1()
+    for result in req['results']:
+        document = DocumentModel(result, None, None)
+        plain_text.update(document.plain_text.encode('utf-8') + b'\0')
+        normalized_text.update(document.normalized_text.encode('utf-8') + b'\0')
+    return {'plain_text': plain_text.hexdigest(), 'normalized_text': normalized_text.hexdigest()}
+
+
+class NormalizerGoldenCase(unittest.TestCase):
+    def setUp(self):
+        with open(GOLDEN_PATH) as f:
+            self.golden = json.load(f)
+
+    def test_golden_files_exist(self):
+        for filename in self.golden:
+            self.assertTrue(os.path.exists(os.path.join('./data', filename)), filename)
+
+    def test_same_output(self):
+        for filename, expected in sorted(self.golden.items()):
+            with self.subTest(filename=filename):
+                self.assertEqual(text_hashes(os.path.join('./data', filename)), expected)
+
+    def test_equivalent_rules(self):
+        document = DocumentModel(None, None, None)
+        cases = {
+            'a,[x]b': 'a, b',
+            'a.[1]b': 'a. b',
+            'pi is 3.14, not 3,15.': 'pi is 3.14,  not 3,15. ',
+            'one.\ntwo': 'one.  two',
+            'open [bracket': 'open [bracket',
+            '<pre>code.</pre>text': 'text',
+        }
+        for text, expected in cases.items():
+            self.assertEqual(document.normalize(text), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+"""
+    test_readability.py: checks that the fast readability backend agrees with spacy-readability
+        on the documents in data/ and readability_test/data/
+    Must be launched from root of adaptation's folder:
+        python test/test_readability.py --max-error 10
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import sys
+sys.path.append('./')
+
+import argparse
+import glob
+import json
+import os
+
+import numpy as np
+import spacy
+from spacy_readability import Readability
+
+from document_adaptation import readability
+from document_adaptation.document_model import DocumentModel
+from document_adaptation.salient_sentences import split_sentences
+
+parser = argparse.ArgumentParser(
+    description='Compare the Flesch-Kincaid reading ease of the fast backend with spacy-readability')
+parser.add_argument('--max-error', type=float, default=10,
+                    help='maximum mean absolute difference allowed between the two backends')
+parser.add_argument('--model', type=str, default='en_core_web_md',
+                    help='spacy model of the reference backend')
+args = parser.parse_args()
+
+nlp = spacy.load(args.model)
+nlp.add_pipe(Readability(), last=True)
+
+texts = []
+for path in sorted(glob.glob('./data/*.json')):
+    with open(path) as f:
+        req = json.load(f)
+    if req.get('userProfile', {}).get('language', 'en') != 'en':
+        continue
+    for index, result in enumerate(req.get('results', [])):
+        document = DocumentModel(result, None, nlp)
+        if document.plain_text:
+            texts.append(('{}#{}'.format(os.path.basename(path), index), document))
+for path in sorted(glob.glob('./readability_test/data/*.txt')):
+    with open(path) as f:
+        document = DocumentModel(None, None, nlp)
+        document.plain_text = f.read()
+        texts.append((os.path.basename(path), document))
+
+reference = []
+fast = []
+print("{:<40} {:>8} {:>8}".format('document', 'spacy', 'fast'))
+for name, document in texts:
+    units = split_sentences(document.normalized_text)
+    reference.append(document.flesch_kincaid())
+    fast.append(readability.reading_ease([u.text for u in units]))
+    print("{:<40} {:>8.1f} {:>8.1f}".format(name[:40], reference[-1], fast[-1]))
+
+reference = np.array(reference)
+fast = np.array(fast)
+error = np.mean(np.abs(reference - fast))
+correlation = np.corrcoef(reference, fast)[0, 1]
+print("Documents: {}, mean absolute difference: {:.2f}, correlation: {:.3f}".format(len(texts), error, correlation))
+if error > args.max_error:
+    print("FAILED: the fast backend differs more than {}".format(args.max_error))
+    sys.exit(1)
@@ -0,0 +1,204 @@
+"""
+    test_response_cache.py: checks the single-flight computation (streamed too), time to live and eviction of ResponseCache
+    Must be launched from root of adaptation's folder:
+        python test/test_response_cache.py
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import sys
+sys.path.append('./')
+
+import threading
+import time
+import unittest
+from unittest import mock
+
+from response_cache import ResponseCache
+
+CALLERS = 5
+
+
+class SlowCompute():
+    """ Computation that blocks until released, counting its calls """
+    def __init__(self, value='tailored text', error=None):
+        self.value = value
+        self.error = error
+        self.calls = 0
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+def run_concurrently(cache, key, compute, callers=CALLERS):
+    """
+    Call get_or_compute from many threads, releasing the computation once all of them are waiting
+    @return (results, errors) of the callers
+    """
+    results, errors = [], []
+
+    def call():
+        try:
+            results.append(cache.get_or_compute(key, compute))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    compute.started.wait(5)
+    deadline = time.time() + 5
+    while cache.stats()['waits'] < callers - 1 and time.time() < deadline:
+        time.sleep(0.01)
+    compute.release.set()
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive(), "caller still blocked"
+    return results, errors
+
+
+class ResponseCacheCase(unittest.TestCase):
+    def test_concurrent_callers_compute_once(self):
+        cache = ResponseCache(max_entries=4, ttl=60)
+        compute = SlowCompute()
+        results, errors = run_concurrently(cache, 'key', compute)
+        self.assertEqual(compute.calls, 1)
+        self.assertEqual(results, [compute.value] * CALLERS)
+        self.assertEqual(errors, [])
+        self.assertEqual(cache.stats(), {'entries': 1, 'hits': 0, 'misses': 1, 'waits': CALLERS - 1})
+
+        # later requests are hits
+        self.assertEqual(cache.get_or_compute('key', SlowCompute('other')), compute.value)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_error_releases_waiting_callers(self):
+        cache = ResponseCache(max_entries=4, ttl=60)
+        compute = SlowCompute(error=ValueError('pipeline failed'))
+        results, errors = run_concurrently(cache, 'key', compute)
+        self.assertEqual(compute.calls, 1)
+        self.assertEqual(results, [])
+        self.assertEqual(len(errors), CALLERS)
+        self.assertTrue(all(isinstance(e, ValueError) for e in errors))
+
+        # errors are not cached, the next request computes again
+        self.assertEqual(cache.stats()['entries'], 0)
+        self.assertEqual(cache.get_or_compute('key', lambda: 'recovered'), 'recovered')
+
+    def test_ttl_expiry(self):
+        cache = ResponseCache(max_entries=4, ttl=10)
+        with mock.patch('response_cache.time.time', return_value=1000):
+            self.assertEqual(cache.get_or_compute('key', lambda: 'first'), 'first')
+        with mock.patch('response_cache.time.time', return_value=1009):
+            self.assertEqual(cache.get_or_compute('key', lambda: 'second'), 'first')
+        with mock.patch('response_cache.time.time', return_value=1011):
+            self.assertEqual(cache.get_or_compute('key', lambda: 'second'), 'second')
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_entries=2, ttl=60)
+        cache.get_or_compute('a', lambda: 'A')
+        cache.get_or_compute('b', lambda: 'B')
+        # 'a' becomes the most recently used, 'b' is evicted by 'c'
+        cache.get_or_compute('a', lambda: 'A2')
+        cache.get_or_compute('c', lambda: 'C')
+        self.assertEqual(list(cache.entries), ['a', 'c'])
+        self.assertEqual(cache.get_or_compute('a', lambda: 'A3'), 'A')
+        self.assertEqual(cache.get_or_compute('b', lambda: 'B2'), 'B2')
+
+    def test_streaming_callers_compute_once(self):
+        cache = ResponseCache(max_entries=4, ttl=60)
+        calls = []
+        parts = [('history', 'p1\n'), ('art', 'p2\n')]
+
+        def iterate():
+            calls.append(1)
+            yield from parts
+
+        leader = cache.iter_or_compute('key', iterate)
+        self.assertEqual(next(leader), parts[0])
+        follower_results = []
+        follower = threading.Thread(target=lambda: follower_results.extend(cache.iter_or_compute('key', iterate)))
+        follower.start()
+        deadline = time.time() + 5
+        while cache.stats()['waits'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(list(leader), parts[1:])
+        follower.join(5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(follower_results, [(None, 'p1\np2\n')])
+        self.assertEqual(list(cache.iter_or_compute('key', iterate)), [(None, 'p1\np2\n')])
+
+    def test_streaming_interrupted_hands_over(self):
+        cache = ResponseCache(max_entries=4, ttl=60)
+        calls = []
+
+        def iterate():
+            calls.append(1)
+            yield 'history', 'p1\n'
+            yield 'art', 'p2\n'
+
+        leader = cache.iter_or_compute('key', iterate)
+        next(leader)
+        follower_results = []
+        follower = threading.Thread(target=lambda: follower_results.extend(cache.iter_or_compute('key', iterate)))
+        follower.start()
+        deadline = time.time() + 5
+        while cache.stats()['waits'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        # client disconnected: the waiting request computes the response itself
+        leader.close()
+        follower.join(5)
+        self.assertFalse(follower.is_alive())
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(follower_results, [('history', 'p1\n'), ('art', 'p2\n')])
+        self.assertEqual(cache.get_or_compute('key', lambda: 'other'), 'p1\np2\n')
+
+    def test_interrupted_stream_hands_over_to_get_or_compute(self):
+        cache = ResponseCache(max_entries=4, ttl=60)
+
+        def iterate():
+            yield 'history', 'p1\n'
+            yield 'art', 'p2\n'
+
+        leader = cache.iter_or_compute('key', iterate)
+        next(leader)
+        follower_results, follower_errors = [], []
+
+        def call():
+            try:
+                follower_results.append(cache.get_or_compute('key', lambda: 'computed'))
+            except Exception as e:
+                follower_errors.append(e)
+
+        follower = threading.Thread(target=call)
+        follower.start()
+        deadline = time.time() + 5
+        while cache.stats()['waits'] < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        # client of the stream disconnected: the blocking request computes the response itself
+        leader.close()
+        follower.join(5)
+        self.assertFalse(follower.is_alive())
+        self.assertEqual(follower_errors, [])
+        self.assertEqual(follower_results, ['computed'])
+        self.assertEqual(cache.get_or_compute('key', lambda: 'other'), 'computed')
+
+    def test_disabled(self):
+        cache = ResponseCache(max_entries=0, ttl=60)
+        self.assertEqual(cache.get_or_compute('key', lambda: 'first'), 'first')
+        self.assertEqual(cache.get_or_compute('key', lambda: 'second'), 'second')
+        self.assertEqual(cache.stats()['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+"""
+    test_text_rank.py: checks that salient_sentences.text_rank, built on private helpers of gensim,
+        gives the same sentences as the public gensim summarize() on the documents in data/
+    Must be launched from root of adaptation's folder:
+        python test/test_text_rank.py
+    ArtGuide project SmartApp1920
+    Dipartimento di Informatica Università di Pisa
+    Authors: M. Barato, S. Berti, M. Bonsembiante, P. Lonardi, G. Martini
+    We declare that the content of this file is entirelly
+    developed by the authors
+"""
+
+import sys
+sys.path.append('./')
+
+import glob
+import json
+import unittest
+
+from gensim.summarization import summarize
+
+from document_adaptation.document_model import DocumentModel
+from document_adaptation.salient_sentences import split_sentences, text_rank
+
+
+def sample_texts():
+    """ @return mona_lisa.txt and the normalized texts of the first IR file of data/ """
+    with open('./data/mona_lisa.txt') as f:
+        texts = [f.read()]
+    with open(sorted(glob.glob('./data/ir_*.json'))[0]) as f:
+        req = json.load(f)
+    for result in req['results']:
+        text = DocumentModel(result, None, None).normalized_text
+        if len(split_sentences(text)) > 1:
+            texts.append(text)
+    return texts
+
+
+class TextRankCase(unittest.TestCase):
+    def setUp(self):
+        self.texts = sample_texts()
+
+    def test_same_as_summarize(self):
+        for text in self.texts:
+            for ratio in [0.1, 0.3]:
+                with self.subTest(text=text[:40], ratio=ratio):
+                    self.assertEqual(text_rank(split_sentences(text), ratio=ratio),
+                                     summarize(text, ratio=ratio, split=True))
+
+    def test_same_as_summarize_word_count(self):
+        for text in self.texts:
+            with self.subTest(text=text[:40]):
+                self.assertEqual(text_rank(split_sentences(text), word_count=100),
+                                 summarize(text, word_count=100, split=True))
+
+    def test_not_split(self):
+        text = self.texts[0]
+        self.assertEqual(text_rank(split_sentences(text), ratio=0.2, split=False),
+                         summarize(text, ratio=0.2, split=False))
+
+
+if __name__ == '__main__':
+    unittest.main()